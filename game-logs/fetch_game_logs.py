@@ -5,11 +5,12 @@ fetch_game_logs.py
 ------------------
 Given a text file exported by your roster‑scraper (one season header, then
 player names), pull every player's game log for that season using nba_api
-and save them to individual CSVs in ./<season>/.
+and save them to one combined ./<season>/_all_logs.parquet (with a Player
+column) per season, optionally also as individual CSVs in ./<season>/.
 
 Usage
 -----
-$ pip install nba_api tqdm pandas
+$ pip install nba_api aiohttp tqdm pandas pyarrow
 $ python fetch_game_logs.py all_players_by_season.txt               --max_workers 6 --rate_limit 0.75
 
 Arguments
@@ -19,50 +20,128 @@ positional:
 
 optional:
     --outdir      Root output directory (default = ./player_logs)
-    --max_workers Concurrent threads (default 6).
-    --rate_limit  Seconds to sleep **after** every request in each thread
-                  (default 0.75 → approx 6‑7 req/s total).
+    --max_workers Concurrent in-flight requests (default 6).
+    --rate_limit  Seconds between requests per worker; all workers share one
+                  token bucket of max_workers / rate_limit req/s
+                  (default 0.75 → 8 req/s total, bursts of max_workers).
+    --emit-csv    Also write one <player>.csv per season directory.
 
-The script prints a season‑level progress bar so you can watch it advance.
+The script prints one progress bar across all seasons (the postfix shows the
+season of the latest completion) so you can watch it advance. Failures are
+appended to <outdir>/failed_game_logs.txt as they happen.
 """
 
-import argparse, time, re, os, sys, unicodedata
-import random
+import argparse, asyncio, fcntl, json, math, time, re, os, sys, unicodedata
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import partial
 from typing import Dict, List
+import aiohttp
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from tqdm.auto import tqdm
 
 from nba_api.stats.static import players
 from nba_api.stats.endpoints import playergamelog
+from nba_api.stats.library.http import NBAStatsHTTP, STATS_HEADERS
+
+# scheduled tasks per worker; the rest of the roster waits as plain tuples
+IN_FLIGHT_PER_WORKER = 4
+
+# transient statuses, resets and timeouts are retried in the fetch helper
+# (backoff doubles)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_TOTAL = 3
+RETRY_BACKOFF_S = 2.0     # unless the server sends Retry-After
+MAX_RETRY_WAIT = 30       # cap (seconds) on any single retry wait, Retry-After included
+
+# season-level parquet: rows per row group, and columns whose type must not
+# be guessed from a single batch (SEASON_ID/Game_ID look numeric, PCTs can be 0)
+BATCH_ROWS = 1024
+STR_COLS = {'Player', 'SEASON_ID', 'Game_ID', 'GAME_DATE', 'MATCHUP', 'WL'}
+FLOAT_COLS = {'FG_PCT', 'FG3_PCT', 'FT_PCT'}
 
 
 # --------------------------------------------------------------------- #
 # Helpers
 # --------------------------------------------------------------------- #
+_SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+@lru_cache(maxsize=None)
 def slugify(name: str) -> str:
     name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
-    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')
+    return _SLUG_RE.sub('_', name).strip('_')
+
+def normalize_season(season: str) -> str:
+    """'2022-2023' / '2022-23' -> '2022-23' (the format stats.nba.com expects)"""
+    if not season[:4].isdigit():
+        return season
+    year = int(season[:4])
+    return f"{year}-{str(year + 1)[-2:]}"
+
+def in_range(season: str, lo: int, hi: int) -> bool:
+    """True if the season's starting year is within [lo, hi]"""
+    return season[:4].isdigit() and lo <= int(season[:4]) <= hi
 
 def parse_roster_txt(path: Path) -> Dict[str, List[str]]:
-    """Return {season: [player, ...]} dict"""
+    """Return {season: [player, ...]} dict, seasons normalized to 'YYYY-YY'"""
     seasons = {}
     current_season = None
     with path.open() as fh:
         for line in fh:
             line = line.strip()
             if line.startswith('Season:'):
-                current_season = line.split('Season:')[1].strip()
-                seasons[current_season] = []
+                current_season = normalize_season(line.split('Season:')[1].strip())
+                seasons.setdefault(current_season, [])
             elif line and not line.startswith('='):
                 if current_season is None:
                     continue
                 seasons[current_season].append(line)
     return seasons
 
+# name.lower() -> id, shared across runs and across the three fetch scripts
+ID_CACHE_PATH = Path(__file__).resolve().parent.parent / 'player_id_cache.json'
+
+def load_id_cache(path: Path = ID_CACHE_PATH) -> Dict[str, int]:
+    try:
+        with path.open(encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def save_id_cache(cache: Dict[str, int], path: Path = ID_CACHE_PATH) -> None:
+    """Merge `cache` into the on-disk file under an exclusive lock"""
+    with path.open('a+', encoding='utf-8') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        fh.seek(0)
+        try:
+            merged = json.load(fh)
+        except ValueError:
+            merged = {}
+        merged.update(cache)
+        fh.seek(0)
+        fh.truncate()
+        json.dump(merged, fh)
+
+ID_CACHE = load_id_cache()
+
+# exact (case-insensitive) full-name index; first entry wins like the scan did
+NAME_TO_ID: Dict[str, int] = {}
+for _p in players.get_players():
+    NAME_TO_ID.setdefault(_p['full_name'].lower(), _p['id'])
+
+@lru_cache(maxsize=None)
 def find_player_id(name: str) -> int | None:
+    key = name.lower()
+    pid = ID_CACHE.get(key) or NAME_TO_ID.get(key) or _search_player_id(name)
+    if pid is not None:
+        ID_CACHE[key] = pid
+    return pid
+
+def _search_player_id(name: str) -> int | None:
     hits = players.find_players_by_full_name(name)
     if not hits:
         return None
@@ -72,28 +151,249 @@ def find_player_id(name: str) -> int | None:
             return h['id']
     return hits[0]['id']
 
-def fetch_save(player_name: str, season: str, out_dir: Path,
-               sleep_seconds: float) -> tuple[str, bool, str]:
-    """Return (name, success, msg)"""
-    time.sleep(sleep_seconds + random.random()*0.3)
-    pid = find_player_id(player_name)
-    if pid is None:
-        return player_name, False, 'Player ID not found'
-    try:
-        df = playergamelog.PlayerGameLog(
-            player_id=pid,
-            season=season,
-            timeout=3          # <-- explicit timeout (seconds)
-        ).get_data_frames()[0]
-        if df.empty:
-            return player_name, False, 'Empty log'
-        fname = out_dir / f"{slugify(player_name)}.csv"
-        df.to_csv(fname, index=False)
-        time.sleep(sleep_seconds)
-        return player_name, True, ''
-    except Exception as e:
-        time.sleep(sleep_seconds)
-        return player_name, False, str(e)
+class TokenBucket:
+    """Request budget shared by every worker: `rate` tokens/s, at most `burst` banked"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def as_completed_bounded(coros, limit: int):
+    """Yield results of `coros` as they finish, with at most `limit` scheduled"""
+    in_flight = set()
+    for coro in coros:
+        in_flight.add(asyncio.ensure_future(coro))
+        if len(in_flight) >= limit:
+            done, in_flight = await asyncio.wait(in_flight,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    while in_flight:
+        done, in_flight = await asyncio.wait(in_flight,
+                                             return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+def log_schema(df: pd.DataFrame) -> pa.Schema:
+    fields = []
+    for f in pa.Schema.from_pandas(df, preserve_index=False):
+        if f.name in FLOAT_COLS:
+            f = f.with_type(pa.float64())
+        elif f.name in STR_COLS or pa.types.is_null(f.type) or pa.types.is_large_string(f.type):
+            f = f.with_type(pa.string())
+        fields.append(f)
+    return pa.schema(fields)
+
+class SeasonLogWriter:
+    """Collect a season's per-player logs into <season_dir>/_all_logs.parquet
+
+    Frames are buffered and written as one row group per BATCH_ROWS rows;
+    with emit_csv the per-player CSVs are emitted at flush time, off the
+    worker path. An existing parquet file is carried over, so resumed runs
+    extend it and `players` doubles as the season's done-set.
+    """
+
+    def __init__(self, season_dir: Path, emit_csv: bool = False):
+        self.season_dir = season_dir
+        self.emit_csv = emit_csv
+        self.path = season_dir / '_all_logs.parquet'
+        self._tmp = self.path.with_name(self.path.name + '.tmp')
+        self._pending: List[tuple[str, pd.DataFrame, bool]] = []
+        self._rows = 0
+        self._writer = None
+        self.schema = None
+        self.players: set[str] = set()
+        if self.path.exists():
+            existing = pq.read_table(self.path)
+            self._open(existing.schema)
+            self._writer.write_table(existing)
+            self.players.update(pc.unique(existing['Player']).to_pylist())
+
+    def _open(self, schema: pa.Schema) -> None:
+        self.schema = schema
+        self._writer = pq.ParquetWriter(self._tmp, schema)
+
+    def add(self, player_name: str, df: pd.DataFrame, write_csv: bool = True) -> None:
+        self._pending.append((player_name, df, write_csv))
+        self.players.add(player_name)
+        self._rows += len(df)
+        if self._rows >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch = pd.concat([df.assign(Player=name) for name, df, _ in self._pending],
+                          ignore_index=True)
+        if self._writer is None:
+            self._open(log_schema(batch))
+        batch = batch.reindex(columns=self.schema.names)
+        self._writer.write_table(
+            pa.Table.from_pandas(batch, schema=self.schema, preserve_index=False))
+        for name, df, write_csv in self._pending:
+            if write_csv and self.emit_csv:
+                df.to_csv(self.season_dir / f"{slugify(name)}.csv", index=False)
+        self._pending.clear()
+        self._rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp, self.path)
+
+def already_saved(path: Path) -> bool:
+    return path.exists() and path.stat().st_size > 0
+
+def retry_delay(headers, attempt: int) -> float:
+    """Seconds to wait before the next attempt: Retry-After if sent, else backoff
+
+    Capped at MAX_RETRY_WAIT: the wait holds a worker slot, so a far-off
+    Retry-After must not freeze it.
+    """
+    after = headers.get('Retry-After') if headers is not None else None
+    delay = RETRY_BACKOFF_S * 2 ** attempt
+    if after:
+        try:
+            delay = float(after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    return min(max(0.0, delay), MAX_RETRY_WAIT)
+
+async def fetch_result_set(session: aiohttp.ClientSession, bucket: TokenBucket,
+                           endpoint) -> dict:
+    """GET an nba_api endpoint built with get_request=False; return resultSets[0]
+
+    Transient statuses (RETRY_STATUSES), connection resets and timeouts are
+    retried up to RETRY_TOTAL times; the last failure is raised. Every
+    attempt, retries included, takes a token from `bucket`.
+    """
+    url = NBAStatsHTTP.base_url.format(endpoint=endpoint.endpoint)
+    params = sorted((k, str(v)) for k, v in endpoint.parameters.items()
+                    if v is not None)
+    timeout = aiohttp.ClientTimeout(total=endpoint.timeout)
+    for attempt in range(RETRY_TOTAL + 1):
+        await bucket.acquire()
+        try:
+            async with session.get(url, params=params, timeout=timeout) as resp:
+                if resp.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                    resp.raise_for_status()
+                    return (await resp.json(content_type=None))['resultSets'][0]
+                delay = retry_delay(resp.headers, attempt)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == RETRY_TOTAL:
+                raise
+            delay = retry_delay(None, attempt)
+        await asyncio.sleep(delay)
+
+async def fetch_save(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                     bucket: TokenBucket, player_name: str, season: str,
+                     writer: SeasonLogWriter) -> tuple[str, str, bool, str]:
+    """Return (season, name, success, msg)"""
+    if player_name in writer.players:
+        return season, player_name, True, 'already'
+    async with sem:
+        pid = find_player_id(player_name)
+        if pid is None:
+            return season, player_name, False, 'Player ID not found'
+        try:
+            rs = await fetch_result_set(session, bucket, playergamelog.PlayerGameLog(
+                player_id=pid,
+                season=season,
+                timeout=3,         # <-- explicit timeout (seconds)
+                get_request=False
+            ))
+            df = pd.DataFrame(rs['rowSet'], columns=rs['headers'])
+            if df.empty:
+                return season, player_name, False, 'Empty log'
+            writer.add(player_name, df)
+            return season, player_name, True, ''
+        except Exception as e:
+            return season, player_name, False, str(e) or type(e).__name__
+
+async def run_seasons(seasons: Dict[str, List[str]], target_seasons: List[str],
+                      root: Path, fail_log, max_workers: int, rate_limit: float,
+                      emit_csv: bool) -> None:
+    """Fetch every (season, player) of the target seasons as one task pool
+
+    Seasons share the connection pool and rate budget, so the next season's
+    players start while the previous season's stragglers are still running.
+    """
+    sem = asyncio.Semaphore(max_workers)
+    bucket = TokenBucket(rate=max_workers / rate_limit if rate_limit > 0 else math.inf,
+                         burst=max_workers)
+    connector = aiohttp.TCPConnector(limit=max_workers)
+    async with aiohttp.ClientSession(connector=connector,
+                                     headers=STATS_HEADERS) as session:
+        writers: Dict[str, SeasonLogWriter] = {}
+        failures: Dict[str, List[tuple[str, str]]] = {}
+        try:
+            jobs = []
+            for season in target_seasons:
+                season_dir = root / season
+                season_dir.mkdir(exist_ok=True)
+                writer = writers[season] = SeasonLogWriter(season_dir, emit_csv)
+                # resumed runs: done = players in the parquet or with a CSV from
+                # an interrupted run (carried into the parquet); schedule the rest,
+                # once per name (duplicates would be fetched and written twice)
+                for name in dict.fromkeys(seasons[season]):
+                    if name in writer.players:
+                        continue
+                    csv_path = season_dir / f"{slugify(name)}.csv"
+                    if already_saved(csv_path):
+                        csv_df = pd.read_csv(csv_path, dtype={c: str for c in STR_COLS})
+                        writer.add(name, csv_df, write_csv=False)
+                    else:
+                        jobs.append((season, name))
+
+            # a season's parquet is finalized as soon as its last job completes
+            remaining = Counter(season for season, _ in jobs)
+            for season in [s for s in writers if not remaining[s]]:
+                writers.pop(season).close()
+
+            coros = (fetch_save(session, sem, bucket, name, season, writers[season])
+                     for season, name in jobs)
+            desc = f"{len(target_seasons)} seasons"
+            with tqdm(total=len(jobs), desc=desc, mininterval=0.5,
+                      miniters=max(1, len(jobs) // 200), smoothing=0) as bar:
+                async for season, name, ok, msg in as_completed_bounded(
+                        coros, IN_FLIGHT_PER_WORKER * max_workers):
+                    if not ok:
+                        fail_log.write(f"{season}\t{name}\t{msg}\n")
+                        failures.setdefault(season, []).append((name, msg))
+                    remaining[season] -= 1
+                    if not remaining[season]:
+                        writers.pop(season).close()
+                    bar.set_postfix(season=season, refresh=False)
+                    bar.update(1)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        # simple report
+        for season in target_seasons:
+            if season in failures:
+                print(f"\n[!] {len(failures[season])} failures in {season}:")
+                for name, msg in failures[season]:
+                    print(f"   - {name}: {msg}")
 
 # --------------------------------------------------------------------- #
 # Main routine
@@ -104,39 +404,28 @@ def main():
     ap.add_argument('--outdir', type=Path, default=Path('player_logs'))
     ap.add_argument('--max_workers', type=int, default=6)
     ap.add_argument('--rate_limit', type=float, default=0.75)
+    ap.add_argument('--emit-csv', action='store_true',
+                    help='also write one CSV per player next to the season parquet')
     args = ap.parse_args()
 
     seasons = parse_roster_txt(args.roster_file)
     root = args.outdir
     root.mkdir(parents=True, exist_ok=True)
 
-    # Define our target seasons in the desired order
-    target_seasons = []
-    for year in range(2019, 2009, -1):  # Start with 2022, go backward to 2010
-        season_str = f"{year}-{str(year+1)[-2:]}"
-        if season_str in seasons:
-            target_seasons.append(season_str)
-    
-    for season in target_seasons:
-        roster = seasons[season]
-        season_dir = root / season
-        season_dir.mkdir(exist_ok=True)
-        desc = f"{season} ({len(roster)} players)"
-        with ThreadPoolExecutor(max_workers=args.max_workers) as exe:
-            futures = [exe.submit(fetch_save, name, season,
-                                  season_dir, args.rate_limit)
-                       for name in roster]
-            for _ in tqdm(as_completed(futures), total=len(futures), desc=desc):
-                pass  # progress bar updates as futures complete
+    # target seasons, newest first: 2019-20 back to 2010-11
+    target_seasons = sorted((s for s in seasons if in_range(s, 2010, 2019)),
+                            key=lambda s: int(s[:4]), reverse=True)
 
-        # simple report
-        failures = [f.result() for f in futures if not f.result()[1]]
-        if failures:
-            print(f"\n[!] {len(failures)} failures in {season}:")
-            for name, _, msg in failures:
-                print(f"   - {name}: {msg}")
+    fail_log_path = root / 'failed_game_logs.txt'
+    try:
+        with fail_log_path.open('a', encoding='utf-8') as fail_log:
+            asyncio.run(run_seasons(seasons, target_seasons, root, fail_log,
+                                    args.max_workers, args.rate_limit, args.emit_csv))
+    finally:
+        save_id_cache(ID_CACHE)
 
     print('\n✓ Game logs saved under', root.resolve())
+    print('  Failures recorded in', fail_log_path.resolve())
 
 if __name__ == '__main__':
     main()
@@ -7,7 +7,7 @@ Fetch biographical / draft data for every player in roster.txt.
 Outputs
 -------
 player_bio_master.csv               – one row per player (all seasons merged)
-player_bios/<slug>.json             – raw CommonPlayerInfo JSON  (optional)
+player_bios/raw_bios.jsonl          – raw CommonPlayerInfo JSON, one line per player
 player_bios/failed_bio.txt          – season, name, reason
 
 Example
@@ -15,42 +15,94 @@ Example
 python fetch_player_bio.py roster.txt --outdir player_bios --threads 8
 """
 
-import argparse, json, random, re, time, unicodedata
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse, asyncio, fcntl, json, math, time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import aiohttp
+import orjson
 import pandas as pd
 from nba_api.stats.endpoints import commonplayerinfo
+from nba_api.stats.library.http import NBAStatsHTTP
 from nba_api.stats.static import players
-from requests.exceptions import ReadTimeout, Timeout
 from tqdm.auto import tqdm
-from unidecode import unidecode
 
 # ---------------- parameters ----------------------------------------- #
-DELAY_BASE  = 1.0         # polite sleep per thread (seconds)
-DELAY_JIT   = 0.5         # extra jitter
+DELAY_BASE  = 1.0         # polite seconds between requests per worker slot
+DELAY_JIT   = 0.5         # extra jitter; the shared bucket paces at the mean
 TIMEOUT_S   = 6
 HEADERS     = {"User-Agent": "bio-scraper/0.1"}
+RETRY_STATUSES  = {429, 500, 502, 503, 504}   # transient; retried in fetch_json
+RETRY_TOTAL     = 3
+RETRY_BACKOFF_S = 2.0     # doubles per retry, unless Retry-After is sent
+MAX_RETRY_WAIT  = 30      # cap (seconds) on any single retry wait, Retry-After included
+COLUMNS     = ["Player", "Player_ID", "Birthdate", "Country", "Height",
+               "Weight_lbs", "Position", "College", "Draft_Year",
+               "Draft_Round", "Draft_Number", "Draft_Team", "Shoot_Hand"]
+IN_FLIGHT_PER_WORKER = 4   # scheduled tasks per thread; the rest wait as names
 # --------------------------------------------------------------------- #
 
 
 # ------------------------- helpers ----------------------------------- #
-def slugify(name: str) -> str:
-    clean = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
-    return re.sub(r"[^A-Za-z0-9]+", "_", clean).strip("_")
+def parse_roster_txt(path: Path) -> List[str]:
+    """Unique names in first-seen order"""
+    names = {}
+    with path.open("r", encoding="utf-8", buffering=1 << 16) as fh:
+        for ln in fh:
+            ln = ln.strip()
+            if ln and not ln.startswith(("=", "Season:")):
+                names[ln] = None
+    return list(names)
 
 
-def parse_roster_txt(path: Path) -> List[str]:
-    names = []
-    for ln in path.read_text(encoding="utf-8").splitlines():
-        ln = ln.strip()
-        if ln and not ln.startswith(("=", "Season:")):
-            names.append(ln)
-    return sorted(set(names))
+# name.lower() -> id, shared across runs and across the three fetch scripts
+ID_CACHE_PATH = Path(__file__).resolve().parent.parent / "player_id_cache.json"
+
+
+def load_id_cache(path: Path = ID_CACHE_PATH) -> Dict[str, int]:
+    try:
+        with path.open(encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_id_cache(cache: Dict[str, int], path: Path = ID_CACHE_PATH) -> None:
+    """Merge `cache` into the on-disk file under an exclusive lock"""
+    with path.open("a+", encoding="utf-8") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        fh.seek(0)
+        try:
+            merged = json.load(fh)
+        except ValueError:
+            merged = {}
+        merged.update(cache)
+        fh.seek(0)
+        fh.truncate()
+        json.dump(merged, fh)
+
+
+ID_CACHE = load_id_cache()
+
+
+# exact (case-insensitive) full-name index; first entry wins like the scan did
+NAME_TO_ID: Dict[str, int] = {}
+for _p in players.get_players():
+    NAME_TO_ID.setdefault(_p["full_name"].lower(), _p["id"])
 
 
+@lru_cache(maxsize=None)
 def player_id_from_name(full_name: str) -> Optional[int]:
+    key = full_name.lower()
+    pid = ID_CACHE.get(key) or NAME_TO_ID.get(key) or _search_player_id(full_name)
+    if pid is not None:
+        ID_CACHE[key] = pid
+    return pid
+
+
+def _search_player_id(full_name: str) -> Optional[int]:
     hits = players.find_players_by_full_name(full_name)
     for h in hits:
         if h["full_name"].lower() == full_name.lower():
@@ -58,14 +110,104 @@ def player_id_from_name(full_name: str) -> Optional[int]:
     return hits[0]["id"] if hits else None
 
 
-def safe_get(ci_row: pd.Series, field: str):
+def safe_get(ci_row: Dict[str, object], field: str):
     return ci_row.get(field, "")
 
 
+def retry_delay(headers, attempt: int) -> float:
+    """Seconds to wait before the next attempt: Retry-After if sent, else backoff
+
+    Capped at MAX_RETRY_WAIT: the wait holds a worker slot, so a far-off
+    Retry-After must not freeze it.
+    """
+    after = headers.get("Retry-After") if headers is not None else None
+    delay = RETRY_BACKOFF_S * 2 ** attempt
+    if after:
+        try:
+            delay = float(after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    return min(max(0.0, delay), MAX_RETRY_WAIT)
+
+
+class TokenBucket:
+    """Request budget shared by every worker: `rate` tokens/s, at most `burst` banked"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def fetch_json(session: aiohttp.ClientSession, bucket: TokenBucket,
+                     endpoint) -> dict:
+    """GET an nba_api endpoint built with get_request=False; return raw JSON
+
+    Transient statuses (RETRY_STATUSES), connection resets and timeouts are
+    retried up to RETRY_TOTAL times; the last failure is raised. Every
+    attempt, retries included, takes a token from `bucket`.
+    """
+    url = NBAStatsHTTP.base_url.format(endpoint=endpoint.endpoint)
+    params = sorted(
+        (k, str(v)) for k, v in endpoint.parameters.items() if v is not None
+    )
+    timeout = aiohttp.ClientTimeout(total=endpoint.timeout)
+    for attempt in range(RETRY_TOTAL + 1):
+        await bucket.acquire()
+        try:
+            async with session.get(url, params=params, timeout=timeout) as resp:
+                if resp.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+                delay = retry_delay(resp.headers, attempt)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == RETRY_TOTAL:
+                raise
+            delay = retry_delay(None, attempt)
+        await asyncio.sleep(delay)
+
+
+async def as_completed_bounded(coros, limit: int):
+    """Yield results of `coros` as they finish, with at most `limit` scheduled"""
+    in_flight = set()
+    for coro in coros:
+        in_flight.add(asyncio.ensure_future(coro))
+        if len(in_flight) >= limit:
+            done, in_flight = await asyncio.wait(in_flight,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    while in_flight:
+        done, in_flight = await asyncio.wait(in_flight,
+                                             return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
 # ------------------------- worker ------------------------------------ #
-def fetch_bio(
+async def fetch_bio(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    bucket: TokenBucket,
     name: str,
-    outdir: Path,
+    raw_log,
 ) -> Tuple[str, bool, str, Dict[str, str]]:
     """
     Return (player_name, success_flag, status, dict_of_fields)
@@ -76,42 +218,64 @@ def fetch_bio(
     if pid is None:
         return name, False, "no_id", {}
 
-    # polite rate-limit
-    time.sleep(DELAY_BASE + random.random() * DELAY_JIT)
-
-    try:
-        ci = commonplayerinfo.CommonPlayerInfo(player_id=pid, timeout=TIMEOUT_S,
-                                               headers=HEADERS)
-        df = ci.get_data_frames()[0]        # always single row
-        row = df.iloc[0]
-
-        bio = {
-            "Player":          name,
-            "Player_ID":       pid,
-            "Birthdate":       safe_get(row, "BIRTHDATE"),
-            "Country":         safe_get(row, "COUNTRY"),
-            "Height":          safe_get(row, "HEIGHT"),   # e.g. 6-10
-            "Weight_lbs":      safe_get(row, "WEIGHT"),
-            "Position":        safe_get(row, "POSITION"),
-            "College":         safe_get(row, "SCHOOL"),
-            "Draft_Year":      safe_get(row, "DRAFT_YEAR"),
-            "Draft_Round":     safe_get(row, "DRAFT_ROUND"),
-            "Draft_Number":    safe_get(row, "DRAFT_NUMBER"),
-            "Draft_Team":      safe_get(row, "DRAFT_TEAM_ID"),
-            "Shoot_Hand":      safe_get(row, "HAND"),
-        }
-
-        # save raw json (optional)
-        (outdir / "raw_json").mkdir(exist_ok=True)
-        with (outdir / "raw_json" / f"{slugify(name)}.json").open("w") as f:
-            json.dump(ci.get_normalized_json(), f)
-
-        return name, True, "ok", bio
-
-    except (ReadTimeout, Timeout):
-        return name, False, "timeout", {}
-    except Exception as e:
-        return name, False, f"error:{e}", {}
+    async with sem:
+        try:
+            ci = commonplayerinfo.CommonPlayerInfo(player_id=pid, timeout=TIMEOUT_S,
+                                                   get_request=False)
+            raw = await fetch_json(session, bucket, ci)
+            rs = raw["resultSets"][0]                   # CommonPlayerInfo
+            row = dict(zip(rs["headers"], rs["rowSet"][0]))   # always single row
+
+            bio = {
+                "Player":          name,
+                "Player_ID":       pid,
+                "Birthdate":       safe_get(row, "BIRTHDATE"),
+                "Country":         safe_get(row, "COUNTRY"),
+                "Height":          safe_get(row, "HEIGHT"),   # e.g. 6-10
+                "Weight_lbs":      safe_get(row, "WEIGHT"),
+                "Position":        safe_get(row, "POSITION"),
+                "College":         safe_get(row, "SCHOOL"),
+                "Draft_Year":      safe_get(row, "DRAFT_YEAR"),
+                "Draft_Round":     safe_get(row, "DRAFT_ROUND"),
+                "Draft_Number":    safe_get(row, "DRAFT_NUMBER"),
+                "Draft_Team":      safe_get(row, "DRAFT_TEAM_ID"),
+                "Shoot_Hand":      safe_get(row, "HAND"),
+            }
+
+            # save raw json: one shared append-only file, not a file per player
+            raw_log.write(orjson.dumps({"name": name, "data": raw}) + b"\n")
+
+            return name, True, "ok", bio
+
+        except asyncio.TimeoutError:
+            return name, False, "timeout", {}
+        except Exception as e:
+            return name, False, f"error:{e}", {}
+
+
+async def run_bios(names: List[str], raw_log, fail_log,
+                   threads: int) -> Dict[str, list]:
+    """Fetch every bio over one shared connection pool; return ok rows by column"""
+    cols = {c: [] for c in COLUMNS}
+    sem = asyncio.Semaphore(threads)
+    delay = DELAY_BASE + DELAY_JIT / 2
+    bucket = TokenBucket(rate=threads / delay if delay > 0 else math.inf, burst=threads)
+    connector = aiohttp.TCPConnector(limit=threads)
+    async with aiohttp.ClientSession(connector=connector,
+                                     headers=HEADERS) as session:
+        coros = (fetch_bio(session, sem, bucket, n, raw_log) for n in names)
+        with tqdm(total=len(names), unit="player", mininterval=0.5,
+                  miniters=max(1, len(names) // 200), smoothing=0) as bar:
+            async for n, ok, status, bio in as_completed_bounded(
+                coros, IN_FLIGHT_PER_WORKER * threads
+            ):
+                if ok:
+                    for c in COLUMNS:
+                        cols[c].append(bio.get(c, ""))
+                else:
+                    fail_log.write(f"{n}\t{status}\n")
+                bar.update(1)
+    return cols
 
 
 # ---------------------------- main ----------------------------------- #
@@ -125,30 +289,23 @@ def main() -> None:
     names = parse_roster_txt(args.roster_file)
     args.outdir.mkdir(parents=True, exist_ok=True)
     fail_log = (args.outdir / "failed_bio.txt").open("a", encoding="utf-8")
+    # every run refetches every bio, so the raw file is rewritten, not appended to
+    raw_log = (args.outdir / "raw_bios.jsonl").open("wb")
 
-    results = []
-    with ThreadPoolExecutor(max_workers=args.threads) as pool, \
-            tqdm(total=len(names), unit="player") as bar:
-
-        fut_to_name = {
-            pool.submit(fetch_bio, n, args.outdir): n
-            for n in names
-        }
-        for fut in as_completed(fut_to_name):
-            n, ok, status, bio = fut.result()
-            if ok:
-                results.append(bio)
-            else:
-                fail_log.write(f"{n}\t{status}\n")
-            bar.update(1)
-
-    fail_log.close()
-
-    if results:
-        pd.DataFrame(results).to_csv(args.outdir / "player_bio_master.csv",
-                                     index=False)
-
-    print(f"\n✓ Bio rows saved: {len(results)}   "
+    try:
+        cols = asyncio.run(run_bios(names, raw_log, fail_log, args.threads))
+    finally:
+        save_id_cache(ID_CACHE)
+        raw_log.close()
+        fail_log.close()
+
+    n_rows = len(cols["Player"])
+    if n_rows:
+        # Draft_* stay object: undrafted players come back as "Undrafted"
+        df = pd.DataFrame(cols).astype({"Player_ID": "int32"})
+        df.to_csv(args.outdir / "player_bio_master.csv", index=False)
+
+    print(f"\n✓ Bio rows saved: {n_rows}   "
           f"|  failures logged: {sum(1 for _ in open(fail_log.name))}")
 
 
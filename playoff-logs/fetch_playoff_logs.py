@@ -3,9 +3,11 @@
 fetch_playoff_logs.py
 ---------------------
 • Downloads **playoff** game logs for every player listed in `roster.txt`.
-• One CSV per player is saved to  ./playoff_logs/<Season>/<slug>.csv
-• Skips files that already exist, retries once on time-out, and writes a
-  central `failed_playoff_logs.txt` with any misses.
+• The whole season is saved to ./playoff_logs/<Season>/_all_logs.parquet;
+  pass --emit-csv to also get one ./playoff_logs/<Season>/<slug>.csv per player.
+• Skips players already in the season parquet, retries throttling, resets and
+  time-outs with backoff (honouring Retry-After), and writes a central
+  `failed_playoff_logs.txt` with any misses.
 • Processes seasons BACKWARD from 2024-2025 to 2015-2016
 
 USAGE
@@ -14,38 +16,123 @@ python fetch_playoff_logs.py roster.txt \
        --outdir playoff_logs --max_workers 8 --rate_limit 1.0 --timeout 6
 """
 
-import argparse, random, re, time, unicodedata
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse, asyncio, fcntl, json, math, os, re, time, unicodedata
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
+import aiohttp
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from nba_api.stats.endpoints import playergamelog
+from nba_api.stats.library.http import NBAStatsHTTP, STATS_HEADERS
 from nba_api.stats.static import players
-from requests.exceptions import ReadTimeout, Timeout
 from tqdm.auto import tqdm
 
+# scheduled tasks per worker; the rest of the roster waits as plain tuples
+IN_FLIGHT_PER_WORKER = 4
+
+# transient statuses, resets and timeouts are retried in the fetch helper
+# (backoff doubles)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_TOTAL = 3
+RETRY_BACKOFF_S = 2.0     # unless the server sends Retry-After
+MAX_RETRY_WAIT = 30       # cap (seconds) on any single retry wait, Retry-After included
+
+# season-level parquet: rows per row group, and columns whose type must not
+# be guessed from a single batch (SEASON_ID/Game_ID look numeric, PCTs can be 0)
+BATCH_ROWS = 1024
+STR_COLS = {"Player", "SEASON_ID", "Game_ID", "GAME_DATE", "MATCHUP", "WL"}
+FLOAT_COLS = {"FG_PCT", "FG3_PCT", "FT_PCT"}
+
 
 # ───────────────────────────── helpers ────────────────────────────────
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+
+
+@lru_cache(maxsize=None)
 def slugify(name: str) -> str:
     cleaned = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
-    return re.sub(r"[^A-Za-z0-9]+", "_", cleaned).strip("_")
+    return _SLUG_RE.sub("_", cleaned).strip("_")
+
+
+def normalize_season(season: str) -> str:
+    """'2022-2023' / '2022-23' -> '2022-23' (the format stats.nba.com expects)"""
+    if not season[:4].isdigit():
+        return season
+    year = int(season[:4])
+    return f"{year}-{str(year + 1)[-2:]}"
+
+
+def in_range(season: str, lo: int, hi: int) -> bool:
+    """True if the season's starting year is within [lo, hi]"""
+    return season[:4].isdigit() and lo <= int(season[:4]) <= hi
 
 
 def parse_roster_txt(path: Path) -> Dict[str, List[str]]:
-    """Return {'1995-96': [player1, player2, …], …}"""
+    """Return {'1995-96': [player1, player2, …], …}, seasons normalized"""
     seasons, current = {}, None
-    for ln in path.read_text(encoding="utf-8").splitlines():
-        ln = ln.strip()
-        if ln.startswith("Season:"):
-            current = ln.split("Season:")[1].strip()
-            seasons[current] = []
-        elif ln and not ln.startswith("=") and current:
-            seasons[current].append(ln)
+    with path.open("r", encoding="utf-8", buffering=1 << 16) as fh:
+        for ln in fh:
+            ln = ln.strip()
+            if ln.startswith("Season:"):
+                current = normalize_season(ln.split("Season:")[1].strip())
+                seasons.setdefault(current, [])
+            elif ln and not ln.startswith("=") and current:
+                seasons[current].append(ln)
     return seasons
 
 
+# name.lower() -> id, shared across runs and across the three fetch scripts
+ID_CACHE_PATH = Path(__file__).resolve().parent.parent / "player_id_cache.json"
+
+
+def load_id_cache(path: Path = ID_CACHE_PATH) -> Dict[str, int]:
+    try:
+        with path.open(encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_id_cache(cache: Dict[str, int], path: Path = ID_CACHE_PATH) -> None:
+    """Merge `cache` into the on-disk file under an exclusive lock"""
+    with path.open("a+", encoding="utf-8") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        fh.seek(0)
+        try:
+            merged = json.load(fh)
+        except ValueError:
+            merged = {}
+        merged.update(cache)
+        fh.seek(0)
+        fh.truncate()
+        json.dump(merged, fh)
+
+
+ID_CACHE = load_id_cache()
+
+
+# exact (case-insensitive) full-name index; first entry wins like the scan did
+NAME_TO_ID: Dict[str, int] = {}
+for _p in players.get_players():
+    NAME_TO_ID.setdefault(_p["full_name"].lower(), _p["id"])
+
+
+@lru_cache(maxsize=None)
 def find_player_id(full_name: str) -> Optional[int]:
+    key = full_name.lower()
+    pid = ID_CACHE.get(key) or NAME_TO_ID.get(key) or _search_player_id(full_name)
+    if pid is not None:
+        ID_CACHE[key] = pid
+    return pid
+
+
+def _search_player_id(full_name: str) -> Optional[int]:
     hits = players.find_players_by_full_name(full_name)
     for h in hits:
         if h["full_name"].lower() == full_name.lower():
@@ -53,54 +140,301 @@ def find_player_id(full_name: str) -> Optional[int]:
     return hits[0]["id"] if hits else None
 
 
+def already_saved(path: Path) -> bool:
+    return path.exists() and path.stat().st_size > 0
+
+
+def retry_delay(headers, attempt: int) -> float:
+    """Seconds to wait before the next attempt: Retry-After if sent, else backoff
+
+    Capped at MAX_RETRY_WAIT: the wait holds a worker slot, so a far-off
+    Retry-After must not freeze it.
+    """
+    after = headers.get("Retry-After") if headers is not None else None
+    delay = RETRY_BACKOFF_S * 2 ** attempt
+    if after:
+        try:
+            delay = float(after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    return min(max(0.0, delay), MAX_RETRY_WAIT)
+
+
+async def fetch_result_set(session: aiohttp.ClientSession, bucket: "TokenBucket",
+                           endpoint) -> dict:
+    """GET an nba_api endpoint built with get_request=False; return resultSets[0]
+
+    Transient statuses (RETRY_STATUSES), connection resets and timeouts are
+    retried up to RETRY_TOTAL times; the last failure is raised. Every
+    attempt, retries included, takes a token from `bucket`.
+    """
+    url = NBAStatsHTTP.base_url.format(endpoint=endpoint.endpoint)
+    params = sorted(
+        (k, str(v)) for k, v in endpoint.parameters.items() if v is not None
+    )
+    timeout = aiohttp.ClientTimeout(total=endpoint.timeout)
+    for attempt in range(RETRY_TOTAL + 1):
+        await bucket.acquire()
+        try:
+            async with session.get(url, params=params, timeout=timeout) as resp:
+                if resp.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                    resp.raise_for_status()
+                    return (await resp.json(content_type=None))["resultSets"][0]
+                delay = retry_delay(resp.headers, attempt)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == RETRY_TOTAL:
+                raise
+            delay = retry_delay(None, attempt)
+        await asyncio.sleep(delay)
+
+
+class TokenBucket:
+    """Request budget shared by every worker: `rate` tokens/s, at most `burst` banked"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def as_completed_bounded(coros, limit: int):
+    """Yield results of `coros` as they finish, with at most `limit` scheduled"""
+    in_flight = set()
+    for coro in coros:
+        in_flight.add(asyncio.ensure_future(coro))
+        if len(in_flight) >= limit:
+            done, in_flight = await asyncio.wait(in_flight,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    while in_flight:
+        done, in_flight = await asyncio.wait(in_flight,
+                                             return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
+def log_schema(df: pd.DataFrame) -> pa.Schema:
+    fields = []
+    for f in pa.Schema.from_pandas(df, preserve_index=False):
+        if f.name in FLOAT_COLS:
+            f = f.with_type(pa.float64())
+        elif (f.name in STR_COLS or pa.types.is_null(f.type)
+              or pa.types.is_large_string(f.type)):
+            f = f.with_type(pa.string())
+        fields.append(f)
+    return pa.schema(fields)
+
+
+class SeasonLogWriter:
+    """Collect a season's per-player logs into <season_dir>/_all_logs.parquet
+
+    Frames are buffered and written as one row group per BATCH_ROWS rows;
+    with emit_csv the per-player CSVs are emitted at flush time, off the
+    worker path. An existing parquet file is carried over, so resumed runs
+    extend it and `players` doubles as the season's done-set.
+    """
+
+    def __init__(self, season_dir: Path, emit_csv: bool = False):
+        self.season_dir = season_dir
+        self.emit_csv = emit_csv
+        self.path = season_dir / "_all_logs.parquet"
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._pending: List[Tuple[str, pd.DataFrame, bool]] = []
+        self._rows = 0
+        self._writer = None
+        self.schema = None
+        self.players: set = set()
+        if self.path.exists():
+            existing = pq.read_table(self.path)
+            self._open(existing.schema)
+            self._writer.write_table(existing)
+            self.players.update(pc.unique(existing["Player"]).to_pylist())
+
+    def _open(self, schema: pa.Schema) -> None:
+        self.schema = schema
+        self._writer = pq.ParquetWriter(self._tmp, schema)
+
+    def add(self, player_name: str, df: pd.DataFrame, write_csv: bool = True) -> None:
+        self._pending.append((player_name, df, write_csv))
+        self.players.add(player_name)
+        self._rows += len(df)
+        if self._rows >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch = pd.concat(
+            [df.assign(Player=name) for name, df, _ in self._pending],
+            ignore_index=True,
+        )
+        if self._writer is None:
+            self._open(log_schema(batch))
+        batch = batch.reindex(columns=self.schema.names)
+        self._writer.write_table(
+            pa.Table.from_pandas(batch, schema=self.schema, preserve_index=False)
+        )
+        for name, df, write_csv in self._pending:
+            if write_csv and self.emit_csv:
+                df.to_csv(self.season_dir / f"{slugify(name)}.csv", index=False)
+        self._pending.clear()
+        self._rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp, self.path)
+
+
 # ──────────────────────────── worker ──────────────────────────────────
-def fetch_and_save(
+async def fetch_and_save(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    bucket: TokenBucket,
     player_name: str,
     season: str,
-    out_dir: Path,
-    sleep_s: float,
+    writer: SeasonLogWriter,
     timeout_s: int,
-) -> Tuple[str, bool, str]:
+) -> Tuple[str, str, bool, str]:
     """
-    Return (player_name, success_flag, status_string)
+    Return (season, player_name, success_flag, status_string)
     status ∈ {'ok','empty','already','timeout','no_id','error:<msg>'}
     """
-    csv_path = out_dir / f"{slugify(player_name)}.csv"
-    if csv_path.exists():
-        return player_name, True, "already"
-
-    # polite rate-limit
-    time.sleep(sleep_s + random.random() * 0.3)
+    if player_name in writer.players:
+        return season, player_name, True, "already"
 
-    pid = find_player_id(player_name)
-    if pid is None:
-        return player_name, False, "no_id"
+    async with sem:
+        pid = find_player_id(player_name)
+        if pid is None:
+            return season, player_name, False, "no_id"
 
-    for attempt in (1, 2):  # one retry
         try:
-            df = playergamelog.PlayerGameLog(
+            rs = await fetch_result_set(session, bucket, playergamelog.PlayerGameLog(
                 player_id=pid,
                 season=season,
                 season_type_all_star="Playoffs",
                 timeout=timeout_s,
-            ).get_data_frames()[0]
+                get_request=False,
+            ))
+            df = pd.DataFrame(rs["rowSet"], columns=rs["headers"])
 
             if df.empty:
-                return player_name, False, "empty"
+                return season, player_name, False, "empty"
 
-            df.to_csv(csv_path, index=False)
-            return player_name, True, "ok"
+            writer.add(player_name, df)
+            return season, player_name, True, "ok"
 
-        except (ReadTimeout, Timeout):
-            if attempt == 1:
-                time.sleep(60)
-                continue
-            return player_name, False, "timeout"
+        except asyncio.TimeoutError:    # retries in fetch_result_set exhausted
+            return season, player_name, False, "timeout"
 
         except Exception as e:
-            return player_name, False, f"error:{e}"
+            return season, player_name, False, f"error:{e}"
 
-    return player_name, False, "unknown"
+
+async def run_seasons(
+    seasons: Dict[str, List[str]],
+    season_order: List[str],
+    outdir: Path,
+    fail_log,
+    max_workers: int,
+    rate_limit: float,
+    timeout_s: int,
+    emit_csv: bool,
+) -> None:
+    """Fetch every (season, player) in `season_order` as one task pool
+
+    Seasons share the connection pool and rate budget, so the next season's
+    players start while the previous season's stragglers are still running.
+    """
+    sem = asyncio.Semaphore(max_workers)
+    bucket = TokenBucket(
+        rate=max_workers / rate_limit if rate_limit > 0 else math.inf,
+        burst=max_workers,
+    )
+    connector = aiohttp.TCPConnector(limit=max_workers)
+    async with aiohttp.ClientSession(connector=connector,
+                                     headers=STATS_HEADERS) as session:
+        writers: Dict[str, SeasonLogWriter] = {}
+        try:
+            jobs = []
+            for season in season_order:
+                if season not in seasons:
+                    continue
+
+                season_dir = outdir / season
+                season_dir.mkdir(exist_ok=True)
+                writer = writers[season] = SeasonLogWriter(season_dir, emit_csv)
+
+                # resumed runs: done = players in the parquet or with a CSV from
+                # an interrupted run (carried into the parquet); schedule the rest,
+                # once per name (duplicates would be fetched and written twice)
+                for name in dict.fromkeys(seasons[season]):
+                    if name in writer.players:
+                        continue
+                    csv_path = season_dir / f"{slugify(name)}.csv"
+                    if already_saved(csv_path):
+                        csv_df = pd.read_csv(csv_path, dtype={c: str for c in STR_COLS})
+                        writer.add(name, csv_df, write_csv=False)
+                    else:
+                        jobs.append((season, name))
+
+            coros = (
+                fetch_and_save(
+                    session,
+                    sem,
+                    bucket,
+                    name,
+                    season,
+                    writers[season],
+                    timeout_s,
+                )
+                for season, name in jobs
+            )
+            desc = f"{len(writers)} playoff seasons"
+
+            # a season's parquet is finalized as soon as its last job completes
+            remaining = Counter(season for season, _ in jobs)
+            for season in [s for s in writers if not remaining[s]]:
+                writers.pop(season).close()
+            with tqdm(
+                total=len(jobs),
+                desc=desc,
+                mininterval=0.5,
+                miniters=max(1, len(jobs) // 200),
+                smoothing=0,
+            ) as bar:
+                async for season, player, ok, status in as_completed_bounded(
+                    coros, IN_FLIGHT_PER_WORKER * max_workers
+                ):
+                    if not ok:
+                        fail_log.write(f"{season}\t{player}\t{status}\n")
+                    remaining[season] -= 1
+                    if not remaining[season]:
+                        writers.pop(season).close()
+                    bar.set_postfix(season=season, refresh=False)
+                    bar.update(1)
+        finally:
+            for writer in writers.values():
+                writer.close()
 
 
 # ───────────────────────────── main ───────────────────────────────────
@@ -110,9 +444,12 @@ def main() -> None:
     ap.add_argument("--outdir", type=Path, default=Path("playoff_logs"))
     ap.add_argument("--max_workers", type=int, default=4)
     ap.add_argument("--rate_limit", type=float, default=1.0,
-                    help="seconds to sleep between requests per thread")
+                    help="seconds between requests per worker; workers share "
+                         "one token bucket of max_workers/rate_limit req/s")
     ap.add_argument("--timeout", type=int, default=6,
                     help="HTTP timeout (seconds) for nba_api calls")
+    ap.add_argument("--emit-csv", action="store_true",
+                    help="also write one CSV per player next to the season parquet")
     args = ap.parse_args()
 
     seasons = parse_roster_txt(args.roster_file)
@@ -120,52 +457,28 @@ def main() -> None:
     fail_log_path = args.outdir / "failed_playoff_logs.txt"
     fail_log = fail_log_path.open("a", encoding="utf-8")
 
-    # Get all seasons and sort them in descending order (backward from most recent)
-    all_seasons = list(seasons.keys())
-    
-    # Filter to only seasons from 2015-16 to 2024-25
-    filtered_seasons = []
-    for season in all_seasons:
-        # Extract the starting year from the season string (e.g., "2024-25" -> 2024)
-        try:
-            year = int(season.split('-')[0])
-            if 2015 <= year <= 2024:
-                filtered_seasons.append(season)
-        except ValueError:
-            continue
-    
-    # Sort seasons in descending order
-    filtered_seasons.sort(key=lambda s: int(s.split('-')[0]), reverse=True)
-    
-    # Process seasons in backward order
-    for season in filtered_seasons:
-        if season not in seasons:
-            continue
-            
-        roster = seasons[season]
-        season_dir = args.outdir / season
-        season_dir.mkdir(exist_ok=True)
-
-        desc = f"{season} playoffs ({len(roster)} players)"
-        with ThreadPoolExecutor(max_workers=args.max_workers) as pool:
-            futs = [
-                pool.submit(
-                    fetch_and_save,
-                    name,
-                    season,
-                    season_dir,
-                    args.rate_limit,
-                    args.timeout,
-                )
-                for name in roster
-            ]
+    # Only seasons from 2015-16 to 2024-25, processed backward from most recent
+    filtered_seasons = sorted(
+        (s for s in seasons if in_range(s, 2015, 2024)),
+        key=lambda s: int(s[:4]),
+        reverse=True,
+    )
 
-            for fut in tqdm(as_completed(futs), total=len(futs), desc=desc):
-                player, ok, status = fut.result()
-                if not ok and status not in ("already",):
-                    fail_log.write(f"{season}\t{player}\t{status}\n")
+    try:
+        asyncio.run(run_seasons(
+            seasons,
+            filtered_seasons,
+            args.outdir,
+            fail_log,
+            args.max_workers,
+            args.rate_limit,
+            args.timeout,
+            args.emit_csv,
+        ))
+    finally:
+        save_id_cache(ID_CACHE)
+        fail_log.close()
 
-    fail_log.close()
     print("\n✓ Playoff logs saved under", args.outdir.resolve())
     print("⚠️  Any failures recorded in", fail_log_path.resolve())
 
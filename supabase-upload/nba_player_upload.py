@@ -9,22 +9,39 @@ This script:
 """
 
 import os
+import hashlib
 import time
-import json
+import random
+import asyncio
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
-
-import requests
-from supabase import create_client, Client
+import logging.handlers
+import sqlite3
+import statistics
+import unicodedata
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, FrozenSet, Iterator, Optional, Set, Tuple
+
+import aiohttp
+import orjson
+from aiohttp_client_cache import CachedSession, SQLiteBackend
 from dotenv import load_dotenv
 
 # Configure logging
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# The log file is written in chunks of 1000 records, straight away on any error, and at exit
+log_file_handler = logging.FileHandler("nba_data_fetch.log")
+log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
-        logging.FileHandler("nba_data_fetch.log"),
+        logging.handlers.MemoryHandler(
+            capacity=1000,
+            flushLevel=logging.ERROR,
+            target=log_file_handler
+        ),
         logging.StreamHandler()
     ]
 )
@@ -40,8 +57,14 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Supabase URL and API key must be provided in environment variables")
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Rows are upserted straight to Supabase's PostgREST API from the same event loop
+SUPABASE_REST_URL = f"{SUPABASE_URL.rstrip('/')}/rest/v1"
+SUPABASE_HEADERS = {
+    'apikey': SUPABASE_KEY,
+    'Authorization': f'Bearer {SUPABASE_KEY}',
+    'Content-Type': 'application/json',
+    'Prefer': 'resolution=merge-duplicates,return=minimal'
+}
 
 # NBA API configuration
 NBA_API_BASE_URL = "https://stats.nba.com/stats"
@@ -72,26 +95,314 @@ PLAYER_CAREER_ENDPOINT = "/playercareerstats"
 PLAYER_PROFILE_ENDPOINT = "/playerprofilev2"
 PLAYER_ALL_ENDPOINT = "/commonallplayers"
 
+# Persistent HTTP cache for the (idempotent) NBA API GETs, keyed by URL + params
+HTTP_CACHE_NAME = "nba_cache.sqlite"
+HTTP_CACHE_EXPIRE_AFTER = {
+    PLAYER_ALL_ENDPOINT: timedelta(days=30),     # player search list
+    PLAYER_INFO_ENDPOINT: timedelta(days=7),
+    PLAYER_STATS_ENDPOINT: timedelta(hours=1),
+    PLAYER_CAREER_ENDPOINT: timedelta(days=1),
+    PLAYER_PROFILE_ENDPOINT: timedelta(days=1),  # season highs
+}
+
+# Hash of the last row upserted per (table, player_id); unchanged rows are not sent
+# again, only their updated_at is refreshed. Delete the file to force a full re-upload.
+ROW_HASH_DB = "row_hashes.sqlite"
+
+# Processed-player records, one JSON object per line, appended after each successful flush
+CHECKPOINT_FILE = "checkpoint.jsonl"
+PROCESSED_PLAYERS_FILE = "processed_players.jsonl"  # the checkpoint, renamed once a run completes
+
 # Constants
 CURRENT_SEASON = "2024-25"  # Update as needed
+FLUSH_EVERY_PLAYERS = 100  # Completed players between batched Supabase upserts
+FETCH_QUEUE_SIZE = 200  # Fetched players waiting for the uploader before fetchers block
+UPSERT_BATCH_SIZE = 500  # Max rows per upsert request
+# nba_players must stay first: it is upserted before the tables whose rows reference it
+UPSERT_TABLES = ("nba_players", "player_current_stats", "player_career_stats", "player_season_highs")
+# A player's endpoint is not fetched again while their row in its table is younger than this
+FRESH_FOR = {
+    "nba_players": HTTP_CACHE_EXPIRE_AFTER[PLAYER_INFO_ENDPOINT],
+    "player_current_stats": HTTP_CACHE_EXPIRE_AFTER[PLAYER_STATS_ENDPOINT],
+    "player_career_stats": HTTP_CACHE_EXPIRE_AFTER[PLAYER_CAREER_ENDPOINT],
+    "player_season_highs": HTTP_CACHE_EXPIRE_AFTER[PLAYER_PROFILE_ENDPOINT],
+}
+FRESH_PAGE_SIZE = 1000  # player_ids per PostgREST page when reading fresh rows
+# Players processed at once (each player's endpoint calls run concurrently); the limit adapts
+# between MIN and MAX based on NBA API latency and throttling (AIMD)
+INITIAL_CONCURRENT_PLAYERS = 8
+MIN_CONCURRENT_PLAYERS = 2
+MAX_CONCURRENT_PLAYERS = 24
+TARGET_LATENCY = 2.0  # Seconds; a slower mean response time shrinks the limit
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # Transient; any other error status fails at once
+MAX_RETRY_WAIT = 30  # Cap (seconds) on any single retry wait, Retry-After included
+RETRY_JITTER = 0.5  # Backoff is stretched by up to this fraction at random
+
+# Supabase column -> NBA API field, one map per table (nested JSON columns get their own)
+PLAYER_BASIC_INFO_MAP = {
+    "first_name": "FIRST_NAME",
+    "last_name": "LAST_NAME",
+    "full_name": "DISPLAY_FIRST_LAST",
+    "jersey_number": "JERSEY",
+    "position": "POSITION",
+    "height": "HEIGHT",
+    "weight": "WEIGHT",
+    "birth_date": "BIRTHDATE",
+    "country": "COUNTRY",
+    "school": "SCHOOL",
+    "draft_year": "DRAFT_YEAR",
+    "draft_round": "DRAFT_ROUND",
+    "draft_number": "DRAFT_NUMBER",
+    "team_id": "TEAM_ID",
+    "team_name": "TEAM_NAME",
+    "from_year": "FROM_YEAR",
+    "to_year": "TO_YEAR",
+}
+CURRENT_STATS_MAP = {
+    "games_played": "GP",
+    "ppg": "PTS",
+    "rpg": "REB",
+    "apg": "AST",
+    "spg": "STL",
+    "bpg": "BLK",
+    "fg_pct": "FG_PCT",
+    "ft_pct": "FT_PCT",
+    "fg3_pct": "FG3_PCT",
+    "minutes": "MIN",
+}
+CURRENT_STATS_ADDL_MAP = {
+    "fg_m": "FGM",
+    "fg_a": "FGA",
+    "fg3_m": "FG3M",
+    "fg3_a": "FG3A",
+    "ft_m": "FTM",
+    "ft_a": "FTA",
+    "oreb": "OREB",
+    "dreb": "DREB",
+    "tov": "TOV",
+    "pf": "PF",
+    "plus_minus": "PLUS_MINUS",
+}
+CAREER_STATS_MAP = {out: inp for out, inp in CURRENT_STATS_MAP.items() if out != "minutes"}
+CAREER_STATS_ADDL_MAP = {out: inp for out, inp in CURRENT_STATS_ADDL_MAP.items() if out != "plus_minus"}
+SEASON_HIGHS_MAP = {
+    "points": "PTS",
+    "rebounds": "REB",
+    "assists": "AST",
+    "steals": "STL",
+    "blocks": "BLK",
+    "highest_minutes": "MIN",
+}
+SEASON_HIGHS_ADDL_MAP = {
+    "field_goals_made": "FGM",
+    "three_pointers_made": "FG3M",
+    "free_throws_made": "FTM",
+    "offensive_rebounds": "OREB",
+    "defensive_rebounds": "DREB",
+    "turnovers": "TOV",
+}
+
+# NBA API columns kept from each resultSet: what the maps above (and the name search) read
+ALL_PLAYERS_COLUMNS = ("PERSON_ID", "DISPLAY_FIRST_LAST", "DISPLAY_LAST_COMMA_FIRST")
+PLAYER_INFO_COLUMNS = tuple(dict.fromkeys(("PERSON_ID", "DISPLAY_FIRST_LAST", *PLAYER_BASIC_INFO_MAP.values())))
+CURRENT_STATS_COLUMNS = tuple(dict.fromkeys((*CURRENT_STATS_MAP.values(), *CURRENT_STATS_ADDL_MAP.values())))
+CAREER_STATS_COLUMNS = tuple(dict.fromkeys((*CAREER_STATS_MAP.values(), *CAREER_STATS_ADDL_MAP.values())))
+SEASON_HIGHS_COLUMNS = tuple(dict.fromkeys((*SEASON_HIGHS_MAP.values(), *SEASON_HIGHS_ADDL_MAP.values())))
+
+
+def map_fields(column_map: Dict[str, str], data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """(Supabase column, value) pairs for `column_map`, None for NBA fields missing from `data`"""
+    return zip(column_map, map(data.get, column_map.values()))
+
+
+def normalize_name(name: str) -> str:
+    """Name search key: accents stripped (NFKD), case folded, whitespace collapsed"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+def column_indices(headers: List[str], columns: Tuple[str, ...]) -> List[Tuple[str, int]]:
+    """(column, position) for each wanted column present in a resultSet's headers"""
+    positions = {header: i for i, header in enumerate(headers)}
+    return [(column, positions[column]) for column in columns if column in positions]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value: Header value, either delay seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the value is missing or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Request budget shared by every in-flight player"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize the token bucket
+
+        Args:
+            rate: Tokens added per second (the steady request rate)
+            burst: Maximum number of tokens banked while idle
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AIMDLimiter:
+    """Concurrency gate that grows additively and shrinks multiplicatively"""
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int, target_latency: float,
+                 increase: int = 1, decrease: float = 0.5, window: int = 32, adjust_every: int = 8):
+        """
+        Initialize the AIMD limiter
+
+        Args:
+            initial: Starting number of permits
+            min_limit: Fewest permits the limit can shrink to
+            max_limit: Most permits the limit can grow to
+            target_latency: Mean latency (seconds) at or below which the limit grows
+            increase: Permits added when latency is on target
+            decrease: Factor applied to the limit on a latency spike or throttle
+            window: Number of recent latencies averaged
+            adjust_every: Number of responses between adjustments
+        """
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.adjust_every = adjust_every
+        self.latencies = deque(maxlen=window)
+        self.in_use = 0
+        self._since_adjust = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+
+    async def _set_limit(self, new_limit: int, reason: str) -> None:
+        new_limit = max(self.min_limit, min(self.max_limit, new_limit))
+        if new_limit == self.limit:
+            return
+        logger.info("Concurrency limit %s -> %s (%s)", self.limit, new_limit, reason)
+        async with self._cond:
+            self.limit = new_limit
+            self._cond.notify_all()
+
+    async def record_latency(self, elapsed: float) -> None:
+        """
+        Record a successful response time, adjusting the limit every `adjust_every` responses
+
+        Args:
+            elapsed: Seconds the request took
+        """
+        self.latencies.append(elapsed)
+        self._since_adjust += 1
+        if self._since_adjust < self.adjust_every:
+            return
+        self._since_adjust = 0
+        mean_latency = statistics.mean(self.latencies)
+        if mean_latency <= self.target_latency:
+            await self._set_limit(self.limit + self.increase, f"mean latency {mean_latency:.2f}s")
+        else:
+            await self._set_limit(int(self.limit * self.decrease), f"mean latency {mean_latency:.2f}s")
+
+    async def record_throttle(self, reason: str) -> None:
+        """
+        Shrink the limit after a throttling response or connection failure
+
+        Args:
+            reason: What happened, for the log
+        """
+        self.latencies.clear()
+        self._since_adjust = 0
+        await self._set_limit(int(self.limit * self.decrease), reason)
 
 
 class NBADataFetcher:
     """Class to handle fetching data from the NBA API"""
 
-    def __init__(self, rate_limit_wait: float = 1.5, max_retries: int = 3):
+    def __init__(self, session: aiohttp.ClientSession, rate_limit_wait: float = 1.5,
+                 max_retries: int = 3, burst: int = 4):
         """
         Initialize the NBA data fetcher
 
         Args:
-            rate_limit_wait: Time to wait between API calls in seconds
+            session: Shared (cached) aiohttp session used for every NBA API call
+            rate_limit_wait: Average time between API calls in seconds (token refill interval)
             max_retries: Maximum number of retry attempts for failed requests
+            burst: Number of requests allowed back to back after an idle period
         """
+        self.session = session
         self.rate_limit_wait = rate_limit_wait
         self.max_retries = max_retries
+        self.limiter = TokenBucket(rate=1 / rate_limit_wait, burst=burst)
+        # Players in flight; shrinks when the API slows down or throttles us
+        self.concurrency = AIMDLimiter(INITIAL_CONCURRENT_PLAYERS, MIN_CONCURRENT_PLAYERS,
+                                       MAX_CONCURRENT_PLAYERS, TARGET_LATENCY)
         self.all_players_cache = None  # Cache for all players
+        self.name_to_id = {}  # normalized "First Last" and "Last, First" -> PERSON_ID, first player wins
+        self.name_index = []  # (PERSON_ID, normalized first last, display name) per cached player, for partial matches
+        self.token_index: Dict[str, Set[int]] = defaultdict(set)  # normalized word -> positions in name_index
+
+    def _retry_delay(self, attempt: int, headers: Optional[Any] = None) -> float:
+        """
+        Work out how long to wait before retrying a request
 
-    def _make_api_request(self, endpoint: str, params: Dict[str, Any], skip_500_retry: bool = False) -> Optional[Dict[str, Any]]:
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            headers: Headers of the failed response, if there was one
+
+        Returns:
+            Seconds to wait: exponential backoff with jitter, or the server's
+            Retry-After if that is longer, capped at MAX_RETRY_WAIT
+        """
+        backoff = self.rate_limit_wait * 2 ** attempt * (1 + random.random() * RETRY_JITTER)
+        retry_after = parse_retry_after(headers.get("Retry-After")) if headers else None
+        return min(MAX_RETRY_WAIT, max(retry_after or 0, backoff))
+
+    async def _make_api_request(self, endpoint: str, params: Dict[str, Any], skip_500_retry: bool = False) -> Optional[Dict[str, Any]]:
         """
         Make a request to the NBA API with rate limiting and retries
 
@@ -104,73 +415,87 @@ class NBADataFetcher:
             The JSON response or None if the request failed after retries
         """
         url = f"{NBA_API_BASE_URL}{endpoint}"
+        params = {key: str(value) for key, value in params.items()}  # aiohttp wants string query values
         retries = 0
-        backoff = self.rate_limit_wait
-
-        # Always wait BEFORE making the request
-        time.sleep(self.rate_limit_wait)
         
         while retries <= self.max_retries:
+            # Every outbound call (retries included) spends a token; only a fresh cache hit
+            # stays local (has_url would also count expired entries, which do go out)
+            cache_key = self.session.cache.create_key("GET", url, params=params)
+            if await self.session.cache.get_response(cache_key) is None:
+                await self.limiter.acquire()
             try:
-                logger.debug(f"Making API request to {url} with params {params}")
-                response = requests.get(
+                logger.debug("Making API request to %s with params %s", url, params)
+                started = time.monotonic()
+                async with self.session.get(
                     url, 
-                    headers=NBA_API_HEADERS, 
                     params=params, 
-                    timeout=20,
+                    timeout=aiohttp.ClientTimeout(total=20),
                     allow_redirects=False  # Prevent redirect loops
-                )
+                ) as response:
                 
-                # Check if we got a 500 error and should skip retries
-                if response.status_code == 500 and skip_500_retry and retries > 0:
-                    logger.warning(f"Received 500 error and skip_500_retry is True. Giving up after {retries+1} attempts.")
-                    return None
-                
-                response.raise_for_status()
-                
-                # Check if we got a redirect
-                if response.status_code >= 300 and response.status_code < 400:
-                    logger.warning(f"Received redirect response ({response.status_code}). Adjusting approach.")
-                    retries += 1
-                    time.sleep(backoff)
-                    backoff *= 2  # Exponential backoff
-                    continue
+                    # Check if we got a 500 error and should skip retries
+                    if response.status == 500 and skip_500_retry and retries > 0:
+                        logger.warning("Received 500 error and skip_500_retry is True. Giving up after %s attempts.", retries+1)
+                        return None
+                    
+                    response.raise_for_status()
+                    
+                    if not 300 <= response.status < 400:
+                        data = orjson.loads(await response.read())
+                        logger.debug("%s responded with Content-Encoding %s", endpoint, response.headers.get("Content-Encoding"))
+                        if not response.from_cache:
+                            await self.concurrency.record_latency(time.monotonic() - started)
+                        return data
                 
-                return response.json()
+                # We got a redirect
+                logger.warning("Received redirect response (%s). Adjusting approach.", response.status)
+                await asyncio.sleep(self._retry_delay(retries))
+                retries += 1
+                continue
                 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"API request error (attempt {retries+1}/{self.max_retries+1}): {e}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
+                logger.error("API request error (attempt %s/%s): %s", retries+1, self.max_retries+1, str(e) or type(e).__name__)
+                # Exponential backoff with jitter, or whatever the server asks for
+                headers = getattr(e, 'headers', None)
+                delay = self._retry_delay(retries, headers)
                 retries += 1
                 
-                # If we're rate limited, wait longer
-                if hasattr(e, 'response') and e.response:
-                    if e.response.status_code == 429:
-                        backoff = max(10, backoff * 2)  # At least 10 seconds, doubling each time
-                        logger.warning(f"Rate limited. Waiting {backoff} seconds before retrying...")
-                    elif e.response.status_code == 500 and skip_500_retry and retries > 0:
-                        # Skip retrying for certain 500 errors that consistently fail
-                        logger.warning(f"Received 500 error and skip_500_retry is True. Giving up after {retries} attempts.")
-                        return None
+                status = getattr(e, 'status', None)
+                if status is not None and status not in RETRY_STATUSES:
+                    # 4xx other than 429 will not get better on a retry
+                    logger.error("Giving up on %s: HTTP %s is not retryable", endpoint, status)
+                    return None
+                if status in (429, 502, 503):
+                    await self.concurrency.record_throttle(f"HTTP {status}")
+                elif isinstance(e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+                    await self.concurrency.record_throttle(type(e).__name__)
                 
-                # Standard exponential backoff for other errors
-                backoff *= 2
+                if status == 429:
+                    remaining = headers.get("X-RateLimit-Remaining") if headers else None
+                    logger.warning("Rate limited (X-RateLimit-Remaining: %s). Waiting %.1f seconds before retrying...", remaining, delay)
+                elif status == 500 and skip_500_retry and retries > 0:
+                    # Skip retrying for certain 500 errors that consistently fail
+                    logger.warning("Received 500 error and skip_500_retry is True. Giving up after %s attempts.", retries)
+                    return None
                 
                 if retries <= self.max_retries:
-                    logger.info(f"Retrying in {backoff} seconds...")
-                    time.sleep(backoff)
+                    logger.info("Retrying in %.1f seconds...", delay)
+                    await asyncio.sleep(delay)
                 else:
-                    logger.error(f"Failed after {self.max_retries+1} attempts.")
+                    logger.error("Failed after %s attempts.", self.max_retries+1)
                     return None
         
         return None
     
-    def fetch_all_players(self, force_refresh: bool = False) -> Optional[List[Dict[str, Any]]]:
+    async def fetch_all_players(self, force_refresh: bool = False) -> Optional[List[Dict[str, Any]]]:
         """
-        Fetch list of all NBA players
-        
+        Fetch list of all NBA players and build the name index that
+        search_player_by_name reads; call once before searching
+
         Args:
             force_refresh: Whether to force a refresh of the cached player list
-            
+
         Returns:
             List of player dictionaries or None if the request failed
         """
@@ -187,7 +512,7 @@ class NBADataFetcher:
             "IsOnlyCurrentSeason": "1"
         }
         
-        response = self._make_api_request(PLAYER_ALL_ENDPOINT, params)
+        response = await self._make_api_request(PLAYER_ALL_ENDPOINT, params)
         
         if not response:
             return None
@@ -202,25 +527,36 @@ class NBADataFetcher:
             headers = result_sets[0]["headers"]
             rows = result_sets[0]["rowSet"]
             
-            # Create list of player dictionaries
-            players = []
-            for row in rows:
-                player = dict(zip(headers, row))
-                players.append(player)
+            # Create list of player dictionaries with just the columns the search needs
+            indices = column_indices(headers, ALL_PLAYERS_COLUMNS)
+            players = [{column: row[i] for column, i in indices} for row in rows]
             
-            # Cache the results
+            # Cache the results, with names normalized once for every later search
             self.all_players_cache = players
+            self.name_to_id = {}
+            self.name_index = []
+            self.token_index = defaultdict(set)
+            for player in players:
+                player_id = player.get("PERSON_ID")
+                display_name = normalize_name(player.get("DISPLAY_FIRST_LAST") or "")
+                self.name_to_id.setdefault(display_name, player_id)
+                self.name_to_id.setdefault(normalize_name(player.get("DISPLAY_LAST_COMMA_FIRST") or ""), player_id)
+                for token in display_name.split():
+                    self.token_index[token].add(len(self.name_index))
+                self.name_index.append((player_id, display_name, player.get("DISPLAY_FIRST_LAST")))
             
-            logger.info(f"Successfully fetched {len(players)} players")
+            logger.info("Successfully fetched %s players", len(players))
             return players
             
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing all players response: {e}")
+            logger.error("Error parsing all players response: %s", e)
             return None
 
     def search_player_by_name(self, player_name: str) -> Optional[int]:
         """
-        Search for a player by name to get their player ID using cached list
+        Search for a player by name to get their player ID using the cached list
+
+        fetch_all_players must have been called first; this only reads its index.
 
         Args:
             player_name: The player's full name
@@ -228,53 +564,44 @@ class NBADataFetcher:
         Returns:
             The player ID or None if not found
         """
-        logger.info(f"Searching for player: {player_name}")
-        
-        # Get all players if we haven't already
-        all_players = self.fetch_all_players()
-        if not all_players:
-            logger.error("Could not fetch player list")
-            return None
+        logger.debug("Searching for player: %s", player_name)
         
         # Normalize the player name for comparison
-        normalized_name = player_name.lower().strip()
+        normalized_name = normalize_name(player_name)
+        name_parts = normalized_name.split()
         
-        # First try exact match
-        for player in all_players:
-            # Check both display name formats
-            display_name = player.get("DISPLAY_FIRST_LAST", "").lower()
-            display_last_first = player.get("DISPLAY_LAST_COMMA_FIRST", "").lower()
-            
-            if normalized_name == display_name or normalized_name == display_last_first:
-                player_id = player.get("PERSON_ID")
-                logger.info(f"Found exact match for {player_name}: ID {player_id}")
-                return player_id
+        # First try exact match against both display name formats
+        player_id = self.name_to_id.get(normalized_name)
+        if player_id is not None:
+            logger.debug("Found exact match for %s: ID %s", player_name, player_id)
+            return player_id
         
-        # Then try partial matches
-        partial_matches = []
-        for player in all_players:
-            display_name = player.get("DISPLAY_FIRST_LAST", "").lower()
-            
-            # Check if the search name is contained in the player name
-            # or if each part of the search name appears in the player name
-            name_parts = normalized_name.split()
-            if (normalized_name in display_name or 
-                all(part in display_name for part in name_parts)):
-                partial_matches.append((
-                    player.get("PERSON_ID"),
-                    player.get("DISPLAY_FIRST_LAST")
-                ))
+        # Then the first player whose name has every part of the search name as a word
+        postings = [self.token_index.get(part) for part in name_parts]
+        if postings and all(postings):
+            matches = set.intersection(*postings)
+            if matches:
+                player_id, _, found_name = self.name_index[min(matches)]
+                logger.debug("Found partial match for %s: %s (ID %s)", player_name, found_name, player_id)
+                return player_id
         
-        if partial_matches:
-            # Just take the first match for simplicity
-            player_id, found_name = partial_matches[0]
-            logger.info(f"Found partial match for {player_name}: {found_name} (ID {player_id})")
+        # Failing that, take the first partial match: the search name is contained
+        # in the player name, or each part of the search name appears in it
+        partial_match = next(
+            ((pid, found_name) for pid, display_name, found_name in self.name_index
+             if normalized_name in display_name
+             or all(part in display_name for part in name_parts)),
+            None
+        )
+        if partial_match:
+            player_id, found_name = partial_match
+            logger.debug("Found partial match for %s: %s (ID %s)", player_name, found_name, player_id)
             return player_id
         
-        logger.warning(f"No player found for: {player_name}")
+        logger.warning("No player found for: %s", player_name)
         return None
 
-    def fetch_player_info(self, player_id: int) -> Optional[Dict[str, Any]]:
+    async def fetch_player_info(self, player_id: int) -> Optional[Dict[str, Any]]:
         """
         Fetch basic information for a player
 
@@ -284,14 +611,14 @@ class NBADataFetcher:
         Returns:
             Dictionary with player information or None if the request failed
         """
-        logger.info(f"Fetching basic info for player {player_id}")
+        logger.debug("Fetching basic info for player %s", player_id)
 
         params = {
             "PlayerID": player_id,
             "LeagueID": "00"
         }
 
-        response = self._make_api_request(PLAYER_INFO_ENDPOINT, params)
+        response = await self._make_api_request(PLAYER_INFO_ENDPOINT, params)
 
         if not response:
             return None
@@ -300,22 +627,21 @@ class NBADataFetcher:
             # Extract player info from the response
             result_sets = response.get("resultSets", [])
             if not result_sets or not result_sets[0].get("rowSet"):
-                logger.warning(f"No data found for player {player_id}")
+                logger.warning("No data found for player %s", player_id)
                 return None
 
             # Get column headers and row data
             headers = result_sets[0]["headers"]
             row_data = result_sets[0]["rowSet"][0]
 
-            # Create dictionary mapping headers to values
-            player_info = dict(zip(headers, row_data))
-            return player_info
+            # Keep only the columns that get stored
+            return {column: row_data[i] for column, i in column_indices(headers, PLAYER_INFO_COLUMNS)}
 
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing player info for {player_id}: {e}")
+            logger.error("Error parsing player info for %s: %s", player_id, e)
             return None
 
-    def fetch_player_stats(self, player_id: int) -> Optional[Dict[str, Any]]:
+    async def fetch_player_stats(self, player_id: int) -> Optional[Dict[str, Any]]:
         """
         Fetch current season stats for a player
 
@@ -325,7 +651,7 @@ class NBADataFetcher:
         Returns:
             Dictionary with player stats or None if the request failed
         """
-        logger.info(f"Fetching current season stats for player {player_id}")
+        logger.debug("Fetching current season stats for player %s", player_id)
 
         params = {
             "PlayerID": player_id,
@@ -336,7 +662,7 @@ class NBADataFetcher:
         }
 
         # Skip retrying for 500 errors after first attempt - this endpoint often gives 500 for valid requests
-        response = self._make_api_request(PLAYER_STATS_ENDPOINT, params, skip_500_retry=True)
+        response = await self._make_api_request(PLAYER_STATS_ENDPOINT, params, skip_500_retry=True)
 
         if not response:
             return None
@@ -345,22 +671,21 @@ class NBADataFetcher:
             # Extract player stats from the response
             result_sets = response.get("resultSets", [])
             if not result_sets or not result_sets[0].get("rowSet") or not result_sets[0]["rowSet"]:
-                logger.warning(f"No current season stats found for player {player_id}")
+                logger.warning("No current season stats found for player %s", player_id)
                 return None
 
             # Get column headers and row data
             headers = result_sets[0]["headers"]
             row_data = result_sets[0]["rowSet"][0]
 
-            # Create dictionary mapping headers to values
-            player_stats = dict(zip(headers, row_data))
-            return player_stats
+            # Keep only the columns that get stored
+            return {column: row_data[i] for column, i in column_indices(headers, CURRENT_STATS_COLUMNS)}
 
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing player stats for {player_id}: {e}")
+            logger.error("Error parsing player stats for %s: %s", player_id, e)
             return None
 
-    def fetch_player_career_stats(self, player_id: int) -> Optional[Dict[str, Any]]:
+    async def fetch_player_career_stats(self, player_id: int) -> Optional[Dict[str, Any]]:
         """
         Fetch career stats for a player
 
@@ -370,7 +695,7 @@ class NBADataFetcher:
         Returns:
             Dictionary with career stats or None if the request failed
         """
-        logger.info(f"Fetching career stats for player {player_id}")
+        logger.debug("Fetching career stats for player %s", player_id)
 
         params = {
             "PlayerID": player_id,
@@ -378,7 +703,7 @@ class NBADataFetcher:
             "PerMode": "PerGame"
         }
 
-        response = self._make_api_request(PLAYER_CAREER_ENDPOINT, params)
+        response = await self._make_api_request(PLAYER_CAREER_ENDPOINT, params)
 
         if not response:
             return None
@@ -394,22 +719,21 @@ class NBADataFetcher:
                     break
 
             if not career_totals_set or not career_totals_set.get("rowSet") or not career_totals_set["rowSet"]:
-                logger.warning(f"No career stats found for player {player_id}")
+                logger.warning("No career stats found for player %s", player_id)
                 return None
 
             # Get column headers and row data
             headers = career_totals_set["headers"]
             row_data = career_totals_set["rowSet"][0]
 
-            # Create dictionary mapping headers to values
-            career_stats = dict(zip(headers, row_data))
-            return career_stats
+            # Keep only the columns that get stored
+            return {column: row_data[i] for column, i in column_indices(headers, CAREER_STATS_COLUMNS)}
 
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing career stats for {player_id}: {e}")
+            logger.error("Error parsing career stats for %s: %s", player_id, e)
             return None
 
-    def fetch_player_season_highs(self, player_id: int) -> Optional[Dict[str, Any]]:
+    async def fetch_player_season_highs(self, player_id: int) -> Optional[Dict[str, Any]]:
         """
         Fetch season highs for a player
 
@@ -419,7 +743,7 @@ class NBADataFetcher:
         Returns:
             Dictionary with season highs or None if the request failed
         """
-        logger.info(f"Fetching season highs for player {player_id}")
+        logger.debug("Fetching season highs for player %s", player_id)
 
         params = {
             "PlayerID": player_id,
@@ -427,7 +751,7 @@ class NBADataFetcher:
         }
 
         # Skip retrying for 500 errors after first attempt - this endpoint often gives 500 for valid requests
-        response = self._make_api_request(PLAYER_PROFILE_ENDPOINT, params, skip_500_retry=True)
+        response = await self._make_api_request(PLAYER_PROFILE_ENDPOINT, params, skip_500_retry=True)
 
         if not response:
             return None
@@ -436,7 +760,7 @@ class NBADataFetcher:
             # Extract needed sections from the profile
             result_sets = response.get("resultSets", [])
             if not result_sets:
-                logger.warning(f"No profile data found for player {player_id}")
+                logger.warning("No profile data found for player %s", player_id)
                 return None
 
             season_highs_set = None
@@ -446,258 +770,324 @@ class NBADataFetcher:
                     break
 
             if not season_highs_set or not season_highs_set.get("rowSet") or not season_highs_set["rowSet"]:
-                logger.warning(f"No season highs found for player {player_id}")
+                logger.warning("No season highs found for player %s", player_id)
                 return None
 
             # Get column headers and row data
             headers = season_highs_set["headers"]
             row_data = season_highs_set["rowSet"][0]
 
-            # Create dictionary mapping headers to values
-            season_highs = dict(zip(headers, row_data))
-            return season_highs
+            # Keep only the columns that get stored
+            return {column: row_data[i] for column, i in column_indices(headers, SEASON_HIGHS_COLUMNS)}
 
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing season highs for {player_id}: {e}")
+            logger.error("Error parsing season highs for %s: %s", player_id, e)
             return None
 
 
+class RowHashStore:
+    """(table, player_id) -> hash of the row last upserted, persisted in SQLite"""
+
+    def __init__(self, path: str = ROW_HASH_DB):
+        self._conn = sqlite3.connect(path)
+        # One commit per upserted batch: WAL appends to a log instead of rewriting pages under a rollback journal
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS row_hashes ("
+            "table_name TEXT NOT NULL, player_id INTEGER NOT NULL, hash TEXT NOT NULL, "
+            "PRIMARY KEY (table_name, player_id))"
+        )
+        self._hashes = {(table, player_id): row_hash for table, player_id, row_hash
+                        in self._conn.execute("SELECT table_name, player_id, hash FROM row_hashes")}
+
+    @staticmethod
+    def row_hash(row: Dict[str, Any]) -> str:
+        return hashlib.blake2b(orjson.dumps(row, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+    def get(self, table: str, player_id: Any) -> Optional[str]:
+        return self._hashes.get((table, player_id))
+
+    def update(self, table: str, hashes: Dict[Any, str]) -> None:
+        """Record the hashes of rows that were just upserted into `table`"""
+        self._hashes.update(((table, player_id), row_hash) for player_id, row_hash in hashes.items())
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO row_hashes (table_name, player_id, hash) VALUES (?, ?, ?)",
+                ((table, player_id, row_hash) for player_id, row_hash in hashes.items())
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
 class SupabaseUploader:
-    """Class to handle uploading data to Supabase"""
+    """Class to handle uploading data to Supabase in batches"""
 
-    def __init__(self, client: Client):
+    def __init__(self, session: aiohttp.ClientSession, rest_url: str = SUPABASE_REST_URL,
+                 row_hashes: Optional[RowHashStore] = None):
         """
         Initialize the Supabase uploader
 
         Args:
-            client: Initialized Supabase client
+            session: aiohttp session carrying the Supabase auth headers (SUPABASE_HEADERS)
+            rest_url: Base URL of the project's PostgREST API
+            row_hashes: Hashes of previously upserted rows; rows that match are skipped
+        """
+        self.session = session
+        self.rest_url = rest_url
+        self.row_hashes = row_hashes
+        # table -> {player_id: (row, hash)}; a later row for the same player replaces the earlier one
+        self._pending: Dict[str, Dict[Any, Tuple[Dict[str, Any], Optional[str]]]] = {table: {} for table in UPSERT_TABLES}
+        # table -> player_ids whose row was skipped as unchanged; only their updated_at is refreshed
+        self._unchanged: Dict[str, Set[Any]] = {table: set() for table in UPSERT_TABLES}
+        self.skipped_unchanged = 0
+
+    def _stage(self, table: str, row: Dict[str, Any]) -> None:
+        row_hash = None
+        if self.row_hashes is not None:
+            row_hash = self.row_hashes.row_hash(row)
+            if self.row_hashes.get(table, row["player_id"]) == row_hash:
+                self.skipped_unchanged += 1
+                logger.debug("Unchanged %s row for player %s; not upserting", table, row["player_id"])
+                self._pending[table].pop(row["player_id"], None)
+                self._unchanged[table].add(row["player_id"])
+                return
+        self._unchanged[table].discard(row["player_id"])
+        self._pending[table][row["player_id"]] = (row, row_hash)
+
+    def pending_count(self) -> int:
+        """Number of rows waiting for the next flush"""
+        return sum(len(rows) for rows in self._pending.values())
+
+    async def fresh_player_ids(self, table: str, max_age: timedelta) -> Set[int]:
+        """
+        Find players whose row in `table` was upserted recently
+
+        Args:
+            table: Supabase table to check
+            max_age: Rows with an older updated_at do not count
+
+        Returns:
+            IDs of players with a fresh row (empty if the query fails)
+        """
+        since = (datetime.now(timezone.utc) - max_age).strftime("%Y-%m-%dT%H:%M:%SZ")
+        player_ids: Set[int] = set()
+        try:
+            while True:
+                async with self.session.get(
+                    f"{self.rest_url}/{table}",
+                    params={"select": "player_id", "updated_at": f"gte.{since}",
+                            "order": "player_id", "offset": str(len(player_ids)), "limit": str(FRESH_PAGE_SIZE)},
+                    timeout=aiohttp.ClientTimeout(total=60)
+                ) as response:
+                    if response.status >= 300:
+                        logger.warning("Could not read fresh rows from %s: HTTP %s %s",
+                                       table, response.status, await response.text())
+                        return set()
+                    rows = orjson.loads(await response.read())
+                player_ids.update(row["player_id"] for row in rows)
+                if len(rows) < FRESH_PAGE_SIZE:
+                    return player_ids
+        except Exception as e:
+            logger.warning("Could not read fresh rows from %s: %s", table, e)
+            return set()
+
+    async def _upsert(self, table: str, staged: List[Tuple[Dict[str, Any], Optional[str]]]) -> bool:
+        """Upsert one batch of staged (row, hash) pairs into `table`"""
+        batch = [row for row, _ in staged]
+        try:
+            async with self.session.post(
+                f"{self.rest_url}/{table}",
+                params={"on_conflict": "player_id"},
+                data=orjson.dumps(batch),
+                timeout=aiohttp.ClientTimeout(total=60)
+            ) as response:
+                if response.status >= 300:
+                    logger.error("Error upserting %s rows into %s: HTTP %s %s",
+                                 len(batch), table, response.status, await response.text())
+                    return False
+
+            logger.info("Upserted %s rows into %s", len(batch), table)
+            if self.row_hashes is not None:
+                self.row_hashes.update(table, {row["player_id"]: row_hash for row, row_hash in staged})
+            return True
+
+        except Exception as e:
+            logger.error("Exception upserting %s rows into %s: %s", len(batch), table, e, exc_info=True)
+            return False
+
+    async def _touch(self, table: str, player_ids: List[Any], now: str) -> None:
+        """
+        Re-stamp updated_at on rows skipped as unchanged
+
+        Without this their updated_at would age past FRESH_FOR, and every later
+        run would fetch those players from the NBA API again. A failure is only
+        logged: the rows themselves are already up to date.
+        """
+        try:
+            async with self.session.patch(
+                f"{self.rest_url}/{table}",
+                params={"player_id": f"in.({','.join(map(str, player_ids))})"},
+                data=orjson.dumps({"updated_at": now}),
+                timeout=aiohttp.ClientTimeout(total=60)
+            ) as response:
+                if response.status >= 300:
+                    logger.warning("Could not refresh updated_at on %s unchanged %s rows: HTTP %s %s",
+                                   len(player_ids), table, response.status, await response.text())
+                    return
+            logger.info("Refreshed updated_at on %s unchanged rows in %s", len(player_ids), table)
+        except Exception as e:
+            logger.warning("Could not refresh updated_at on %s unchanged %s rows: %s", len(player_ids), table, e)
+
+    async def flush(self, batch_size: int = UPSERT_BATCH_SIZE) -> bool:
+        """
+        Upsert every staged row, one request per table per `batch_size` rows
+
+        nba_players goes first, since the stats tables may reference it; the
+        other tables' requests then go out together, so a flush takes about
+        two round trips rather than one per table. Rows skipped as unchanged
+        get only their updated_at refreshed, so they keep counting as fresh.
+
+        Args:
+            batch_size: Maximum number of rows per upsert request
+
+        Returns:
+            True if every batch was stored, False otherwise
         """
-        self.client = client
+        pending, self._pending = self._pending, {table: {} for table in UPSERT_TABLES}
+        unchanged, self._unchanged = self._unchanged, {table: set() for table in UPSERT_TABLES}
+
+        # Every row in this flush shares one ingest time
+        now = datetime.now(timezone.utc).isoformat()
+        batches: Dict[str, List[List[Tuple[Dict[str, Any], Optional[str]]]]] = {}
+        for table, rows_by_player in pending.items():
+            staged = list(rows_by_player.values())
+            for row, _ in staged:
+                row["updated_at"] = now
+            batches[table] = [staged[start:start + batch_size] for start in range(0, len(staged), batch_size)]
+        touches = {table: sorted(player_ids) for table, player_ids in unchanged.items()}
+
+        ok = True
+        for tables in (UPSERT_TABLES[:1], UPSERT_TABLES[1:]):
+            results, _ = await asyncio.gather(
+                asyncio.gather(*(self._upsert(table, staged) for table in tables for staged in batches[table])),
+                asyncio.gather(*(self._touch(table, touches[table][start:start + batch_size], now)
+                                 for table in tables for start in range(0, len(touches[table]), batch_size)))
+            )
+            ok = all(results) and ok
+        return ok
 
     def store_player_basic_info(self, player_data: Dict[str, Any]) -> bool:
         """
-        Store basic player information in Supabase
+        Stage basic player information for the next batched upsert to Supabase
 
         Args:
             player_data: Player data dictionary
 
         Returns:
-            True if successful, False otherwise
+            True if the row was staged, False otherwise
         """
         player_id = player_data.get("PERSON_ID")
         player_name = player_data.get("DISPLAY_FIRST_LAST", f"ID: {player_id}")
-        logger.info(f"Storing basic info for {player_name}")
+        logger.debug("Formatting basic info for %s", player_name)
 
         try:
             # Format data for the nba_players table
-            formatted_data = {
-                "player_id": player_id,
-                "first_name": player_data.get("FIRST_NAME"),
-                "last_name": player_data.get("LAST_NAME"),
-                "full_name": player_data.get("DISPLAY_FIRST_LAST"),
-                "jersey_number": player_data.get("JERSEY"),
-                "position": player_data.get("POSITION"),
-                "height": player_data.get("HEIGHT"),
-                "weight": player_data.get("WEIGHT"),
-                "birth_date": player_data.get("BIRTHDATE"),
-                "country": player_data.get("COUNTRY"),
-                "school": player_data.get("SCHOOL"),
-                "draft_year": player_data.get("DRAFT_YEAR"),
-                "draft_round": player_data.get("DRAFT_ROUND"),
-                "draft_number": player_data.get("DRAFT_NUMBER"),
-                "team_id": player_data.get("TEAM_ID"),
-                "team_name": player_data.get("TEAM_NAME"),
-                "from_year": player_data.get("FROM_YEAR"),
-                "to_year": player_data.get("TO_YEAR"),
-                "updated_at": datetime.now().isoformat()
-            }
-
-            # Insert or update player data
-            result = self.client.table("nba_players").upsert(
-                formatted_data,
-                on_conflict="player_id"
-            ).execute()
-
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error storing basic info for {player_name}: {result.error}")
-                return False
-
-            logger.info(f"Successfully stored basic info for {player_name}")
+            formatted_data = {"player_id": player_id}
+            formatted_data.update(map_fields(PLAYER_BASIC_INFO_MAP, player_data))
+
+            # Queue for the next batched upsert
+            self._stage("nba_players", formatted_data)
+            logger.debug("Staged basic info for %s", player_name)
             return True
 
         except Exception as e:
-            logger.error(f"Exception storing basic info for {player_name}: {e}", exc_info=True)
+            logger.error("Exception formatting basic info for %s: %s", player_name, e, exc_info=True)
             return False
 
     def store_player_current_stats(self, player_id: int, stats_data: Dict[str, Any]) -> bool:
         """
-        Store current season stats in Supabase
+        Stage current season stats for the next batched upsert to Supabase
 
         Args:
             player_id: Player ID
             stats_data: Stats data dictionary
 
         Returns:
-            True if successful, False otherwise
+            True if the row was staged, False otherwise
         """
-        logger.info(f"Storing current stats for player {player_id}")
+        logger.debug("Formatting current stats for player %s", player_id)
 
         try:
             # Format data for the player_current_stats table
-            formatted_data = {
-                "player_id": player_id,
-                "season": CURRENT_SEASON,
-                "games_played": stats_data.get("GP"),
-                "ppg": stats_data.get("PTS"),
-                "rpg": stats_data.get("REB"),
-                "apg": stats_data.get("AST"),
-                "spg": stats_data.get("STL"),
-                "bpg": stats_data.get("BLK"),
-                "fg_pct": stats_data.get("FG_PCT"),
-                "ft_pct": stats_data.get("FT_PCT"),
-                "fg3_pct": stats_data.get("FG3_PCT"),
-                "minutes": stats_data.get("MIN"),
-                "additional_stats": {
-                    "fg_m": stats_data.get("FGM"),
-                    "fg_a": stats_data.get("FGA"),
-                    "fg3_m": stats_data.get("FG3M"),
-                    "fg3_a": stats_data.get("FG3A"),
-                    "ft_m": stats_data.get("FTM"),
-                    "ft_a": stats_data.get("FTA"),
-                    "oreb": stats_data.get("OREB"),
-                    "dreb": stats_data.get("DREB"),
-                    "tov": stats_data.get("TOV"),
-                    "pf": stats_data.get("PF"),
-                    "plus_minus": stats_data.get("PLUS_MINUS")
-                },
-                "updated_at": datetime.now().isoformat()
-            }
-
-            # Insert or update the stats data
-            result = self.client.table("player_current_stats").upsert(
-                formatted_data,
-                on_conflict="player_id"
-            ).execute()
-
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error storing current stats for player {player_id}: {result.error}")
-                return False
-
-            logger.info(f"Successfully stored current stats for player {player_id}")
+            formatted_data = {"player_id": player_id, "season": CURRENT_SEASON}
+            formatted_data.update(map_fields(CURRENT_STATS_MAP, stats_data))
+            formatted_data["additional_stats"] = dict(map_fields(CURRENT_STATS_ADDL_MAP, stats_data))
+
+            # Queue for the next batched upsert
+            self._stage("player_current_stats", formatted_data)
+            logger.debug("Staged current stats for player %s", player_id)
             return True
 
         except Exception as e:
-            logger.error(f"Exception storing current stats for player {player_id}: {e}", exc_info=True)
+            logger.error("Exception formatting current stats for player %s: %s", player_id, e, exc_info=True)
             return False
 
     def store_player_career_stats(self, player_id: int, career_data: Dict[str, Any]) -> bool:
         """
-        Store career stats in Supabase
+        Stage career stats for the next batched upsert to Supabase
 
         Args:
             player_id: Player ID
             career_data: Career stats data dictionary
 
         Returns:
-            True if successful, False otherwise
+            True if the row was staged, False otherwise
         """
-        logger.info(f"Storing career stats for player {player_id}")
+        logger.debug("Formatting career stats for player %s", player_id)
 
         try:
             # Format data for the player_career_stats table
-            formatted_data = {
-                "player_id": player_id,
-                "games_played": career_data.get("GP"),
-                "ppg": career_data.get("PTS"),
-                "rpg": career_data.get("REB"),
-                "apg": career_data.get("AST"),
-                "spg": career_data.get("STL"),
-                "bpg": career_data.get("BLK"),
-                "fg_pct": career_data.get("FG_PCT"),
-                "ft_pct": career_data.get("FT_PCT"),
-                "fg3_pct": career_data.get("FG3_PCT"),
-                "additional_stats": {
-                    "fg_m": career_data.get("FGM"),
-                    "fg_a": career_data.get("FGA"),
-                    "fg3_m": career_data.get("FG3M"),
-                    "fg3_a": career_data.get("FG3A"),
-                    "ft_m": career_data.get("FTM"),
-                    "ft_a": career_data.get("FTA"),
-                    "oreb": career_data.get("OREB"),
-                    "dreb": career_data.get("DREB"),
-                    "tov": career_data.get("TOV"),
-                    "pf": career_data.get("PF")
-                },
-                "updated_at": datetime.now().isoformat()
-            }
-
-            # Insert or update the career stats data
-            result = self.client.table("player_career_stats").upsert(
-                formatted_data,
-                on_conflict="player_id"
-            ).execute()
-
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error storing career stats for player {player_id}: {result.error}")
-                return False
-
-            logger.info(f"Successfully stored career stats for player {player_id}")
+            formatted_data = {"player_id": player_id}
+            formatted_data.update(map_fields(CAREER_STATS_MAP, career_data))
+            formatted_data["additional_stats"] = dict(map_fields(CAREER_STATS_ADDL_MAP, career_data))
+
+            # Queue for the next batched upsert
+            self._stage("player_career_stats", formatted_data)
+            logger.debug("Staged career stats for player %s", player_id)
             return True
 
         except Exception as e:
-            logger.error(f"Exception storing career stats for player {player_id}: {e}", exc_info=True)
+            logger.error("Exception formatting career stats for player %s: %s", player_id, e, exc_info=True)
             return False
 
     def store_player_season_highs(self, player_id: int, highs_data: Dict[str, Any]) -> bool:
         """
-        Store season highs in Supabase
+        Stage season highs for the next batched upsert to Supabase
 
         Args:
             player_id: Player ID
             highs_data: Season highs data dictionary
 
         Returns:
-            True if successful, False otherwise
+            True if the row was staged, False otherwise
         """
-        logger.info(f"Storing season highs for player {player_id}")
+        logger.debug("Formatting season highs for player %s", player_id)
 
         try:
             # Format data for the player_season_highs table
-            formatted_data = {
-                "player_id": player_id,
-                "season": CURRENT_SEASON,
-                "points": highs_data.get("PTS"),
-                "rebounds": highs_data.get("REB"),
-                "assists": highs_data.get("AST"),
-                "steals": highs_data.get("STL"),
-                "blocks": highs_data.get("BLK"),
-                "highest_minutes": highs_data.get("MIN"),
-                "additional_highs": {
-                    "field_goals_made": highs_data.get("FGM"),
-                    "three_pointers_made": highs_data.get("FG3M"),
-                    "free_throws_made": highs_data.get("FTM"),
-                    "offensive_rebounds": highs_data.get("OREB"),
-                    "defensive_rebounds": highs_data.get("DREB"),
-                    "turnovers": highs_data.get("TOV")
-                },
-                "updated_at": datetime.now().isoformat()
-            }
-
-            # Insert or update the season highs data
-            result = self.client.table("player_season_highs").upsert(
-                formatted_data,
-                on_conflict="player_id"
-            ).execute()
-
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error storing season highs for player {player_id}: {result.error}")
-                return False
-
-            logger.info(f"Successfully stored season highs for player {player_id}")
+            formatted_data = {"player_id": player_id, "season": CURRENT_SEASON}
+            formatted_data.update(map_fields(SEASON_HIGHS_MAP, highs_data))
+            formatted_data["additional_highs"] = dict(map_fields(SEASON_HIGHS_ADDL_MAP, highs_data))
+
+            # Queue for the next batched upsert
+            self._stage("player_season_highs", formatted_data)
+            logger.debug("Staged season highs for player %s", player_id)
             return True
 
         except Exception as e:
-            logger.error(f"Exception storing season highs for player {player_id}: {e}", exc_info=True)
+            logger.error("Exception formatting season highs for player %s: %s", player_id, e, exc_info=True)
             return False
 
 
@@ -709,21 +1099,308 @@ def load_player_names(file_path: str = "players.txt") -> List[str]:
         file_path: Path to the text file containing player names
 
     Returns:
-        List of player names
+        List of unique player names, in the order they first appear
     """
     try:
         with open(file_path, 'r') as f:
-            # Read lines and strip whitespace
-            player_names = [line.strip() for line in f if line.strip()]
+            # Stream lines, strip whitespace and drop repeats (dicts keep insertion order)
+            unique_names: Dict[str, None] = {}
+            total = 0
+            for line in f:
+                name = line.strip()
+                if name:
+                    total += 1
+                    unique_names.setdefault(name, None)
+        player_names = list(unique_names)
         
-        logger.info(f"Loaded {len(player_names)} player names from {file_path}")
+        logger.info("Loaded %s player names from %s", len(player_names), file_path)
+        if total > len(player_names):
+            logger.info("Skipped %s duplicate player names", total - len(player_names))
         return player_names
             
     except Exception as e:
-        logger.error(f"Error loading player names: {e}")
+        logger.error("Error loading player names: %s", e)
         return []
 
 
+async def fetch_player(fetcher: NBADataFetcher, player_name: str, player_id: int,
+                       fresh_tables: FrozenSet[str] = frozenset()) -> Optional[Tuple[Any, ...]]:
+    """
+    Fetch all data for one player
+
+    The endpoint calls run concurrently. Across players, concurrency is
+    bounded by `fetcher.concurrency`.
+
+    Args:
+        fetcher: NBA data fetcher sharing the process-wide aiohttp session
+        player_name: The player's full name as listed in players.txt
+        player_id: The player's NBA ID, already resolved from the name
+        fresh_tables: Tables already holding a fresh row for this player; their endpoints are skipped
+
+    Returns:
+        (player_id, basic_info, current_stats, career_stats, season_highs, fresh_tables),
+        or None if the player has no basic info
+    """
+    if fresh_tables.issuperset(UPSERT_TABLES):
+        logger.debug("Every table has fresh data for %s; not fetching", player_name)
+        return player_id, None, None, None, None, fresh_tables
+    
+    async def skipped(player_id: int) -> None:
+        return None
+    
+    fetches = (
+        ("nba_players", fetcher.fetch_player_info),
+        ("player_current_stats", fetcher.fetch_player_stats),
+        ("player_career_stats", fetcher.fetch_player_career_stats),
+        ("player_season_highs", fetcher.fetch_player_season_highs),
+    )
+    async with fetcher.concurrency:
+        logger.debug("Processing player: %s...", player_name)
+        
+        results = await asyncio.gather(
+            *((skipped if table in fresh_tables else fetch)(player_id) for table, fetch in fetches),
+            return_exceptions=True
+        )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Unexpected error fetching data for %s: %s", player_name, result, exc_info=result)
+    basic_info, current_stats, career_stats, season_highs = (
+        None if isinstance(result, Exception) else result for result in results
+    )
+    
+    if not basic_info and "nba_players" not in fresh_tables:
+        logger.error("Could not fetch basic info for player: %s (ID: %s)", player_name, player_id)
+        return None
+    return player_id, basic_info, current_stats, career_stats, season_highs, fresh_tables
+
+
+def stage_player(uploader: SupabaseUploader, player_name: str, fetched: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+    """
+    Stage one player's fetched data for the next batched upsert
+
+    Args:
+        uploader: Supabase uploader
+        player_name: The player's full name as listed in players.txt
+        fetched: The tuple returned by fetch_player
+
+    Returns:
+        The processed-player record, or None if the player failed
+    """
+    player_id, basic_info, current_stats, career_stats, season_highs, fresh_tables = fetched
+    
+    # Store basic info (Supabase may already have a fresh row)
+    if "nba_players" not in fresh_tables and not uploader.store_player_basic_info(basic_info):
+        logger.error("Failed to store basic info for player: %s", player_name)
+        return None
+        
+    success = True
+    
+    # Store current season stats - don't worry if they are missing
+    if current_stats:
+        success = uploader.store_player_current_stats(player_id, current_stats) and success
+    elif "player_current_stats" not in fresh_tables:
+        logger.warning("No current season stats available for player: %s", player_name)
+        # Not counting this as a failure - many players don't have current stats
+    
+    # Store career stats
+    if career_stats:
+        success = uploader.store_player_career_stats(player_id, career_stats) and success
+    elif "player_career_stats" not in fresh_tables:
+        logger.warning("No career stats available for player: %s", player_name)
+        # Not counting as a failure, but it's unusual
+    
+    # Store season highs - don't worry if they are missing
+    if season_highs:
+        success = uploader.store_player_season_highs(player_id, season_highs) and success
+    elif "player_season_highs" not in fresh_tables:
+        logger.warning("No season highs available for player: %s", player_name)
+        # Not counting this as a failure - many players don't have season highs
+    
+    # Consider the player processed even if some stats are missing
+    # The most important thing is that we have the basic player info
+    logger.info("Successfully processed player: %s", player_name)
+    return {
+        "name": player_name,
+        "id": player_id,
+        "full_name": (basic_info or {}).get("DISPLAY_FIRST_LAST", player_name),
+        "processed_at": datetime.now().isoformat()
+    }
+
+
+def load_checkpoint(checkpoint_file: str) -> List[Dict[str, Any]]:
+    """
+    Read the processed-player records appended to the checkpoint file
+
+    Args:
+        checkpoint_file: Path of the JSON Lines checkpoint file
+
+    Returns:
+        Records of every player checkpointed so far (empty if there is no file)
+    """
+    records = []
+    try:
+        with open(checkpoint_file, 'rb') as f:
+            for line in f:
+                try:
+                    records.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    # A crash mid-write can leave a partial last line
+                    logger.warning("Ignoring unreadable checkpoint line: %r", line[:80])
+    except FileNotFoundError:
+        pass
+    return records
+
+
+async def process_players(player_names: List[str], counts: Dict[str, Any], checkpoint_file: str) -> None:
+    """
+    Process players concurrently over one shared aiohttp session
+
+    Args:
+        player_names: Names still to process
+        counts: Running 'success'/'fail' counters and the 'last_player' completed
+        checkpoint_file: Path of the checkpoint file, appended to after every successful flush
+    """
+    connector = aiohttp.TCPConnector(limit=20, limit_per_host=10)
+    nba_host_path = NBA_API_BASE_URL.split("://", 1)[-1]
+    cache = SQLiteBackend(
+        cache_name=HTTP_CACHE_NAME,
+        expire_after=min(HTTP_CACHE_EXPIRE_AFTER.values()),
+        urls_expire_after={f"{nba_host_path}{endpoint}": expire_after
+                           for endpoint, expire_after in HTTP_CACHE_EXPIRE_AFTER.items()},
+        allowed_codes=(200,),
+        allowed_methods=("GET",),
+    )
+    with open(checkpoint_file, 'a+b') as checkpoint:
+        # Terminate a partial last line left by a crash so new records start cleanly
+        checkpoint.seek(0, os.SEEK_END)
+        if checkpoint.tell():
+            checkpoint.seek(-1, os.SEEK_END)
+            if checkpoint.read(1) != b"\n":
+                checkpoint.write(b"\n")
+        
+        async with CachedSession(cache=cache, connector=connector, headers=NBA_API_HEADERS) as session, \
+                aiohttp.ClientSession(headers=SUPABASE_HEADERS) as supabase_session:
+            # Initialize classes
+            fetcher = NBADataFetcher(session, rate_limit_wait=1.5, max_retries=3)
+        
+            # Every name search reads this one list, so it has to load first
+            logger.info("Preloading all current NBA players...")
+            all_players = await fetcher.fetch_all_players()
+            if not all_players:
+                logger.error("Failed to preload player list from NBA API; no players can be looked up")
+                counts['fail'] += len(player_names)
+                return
+            logger.info("Successfully preloaded %s players from NBA API", len(all_players))
+        
+            # Resolve every name before any stat calls, so names that are not
+            # in the list never take a concurrency slot
+            resolved: List[Tuple[str, int]] = []
+            for player_name in player_names:
+                player_id = fetcher.search_player_by_name(player_name)
+                if player_id:
+                    resolved.append((player_name, player_id))
+                else:
+                    logger.error("Could not find player ID for: %s", player_name)
+                    counts['fail'] += 1
+            if len(resolved) < len(player_names):
+                logger.info("Skipping %s players not found in the player list", len(player_names) - len(resolved))
+        
+            row_hashes = RowHashStore()
+            uploader = SupabaseUploader(supabase_session, row_hashes=row_hashes)
+        
+            # Players whose rows Supabase already has fresh don't need those endpoints again
+            fresh_ids = dict(zip(FRESH_FOR, await asyncio.gather(
+                *(uploader.fresh_player_ids(table, max_age) for table, max_age in FRESH_FOR.items())
+            )))
+            for table, player_ids in fresh_ids.items():
+                if player_ids:
+                    logger.info("%s players have fresh %s rows; skipping those NBA API calls", len(player_ids), table)
+        
+            # Track progress
+            total_players = len(resolved)
+            progress_interval = max(1, total_players // 20)  # Show progress every ~5%
+            start_time = time.monotonic()
+            last_progress_time = start_time
+        
+            # Players whose rows are staged but not yet upserted
+            unflushed: List[Dict[str, Any]] = []
+        
+            async def flush() -> None:
+                """Upsert staged rows; only then do their players count as processed"""
+                if not unflushed:
+                    return
+                if await uploader.flush():
+                    counts['success'] += len(unflushed)
+                    counts['last_player'] = unflushed[-1]["name"]
+                    checkpoint.write(b"".join(orjson.dumps(record) + b"\n" for record in unflushed))
+                    # One fsync per flushed batch: once rows are upserted, their records survive a power loss
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+                else:
+                    logger.error("Batched upsert failed; %s players will be retried next run", len(unflushed))
+                    counts['fail'] += len(unflushed)
+                unflushed.clear()
+        
+            # Fetchers hand (name, fetched) results to a single uploader task, so
+            # an upsert in flight never holds up the next players' downloads
+            queue: asyncio.Queue = asyncio.Queue(maxsize=FETCH_QUEUE_SIZE)
+        
+            async def fetch_one(player_name: str, player_id: int) -> Tuple[str, Optional[Tuple[Any, ...]]]:
+                fresh_tables = frozenset(table for table, player_ids in fresh_ids.items() if player_id in player_ids)
+                return player_name, await fetch_player(fetcher, player_name, player_id, fresh_tables)
+        
+            # One fetch task per possible concurrency slot, each taking its next player
+            # only once the last is queued: at most MAX_CONCURRENT_PLAYERS are scheduled,
+            # and a full queue stops further fetches rather than just further puts
+            pending = iter(resolved)
+
+            async def fetch_worker() -> None:
+                for player_name, player_id in pending:
+                    await queue.put(await fetch_one(player_name, player_id))
+
+            async def produce() -> None:
+                await asyncio.gather(*(fetch_worker() for _ in range(MAX_CONCURRENT_PLAYERS)))
+                await queue.put(None)  # no more players
+        
+            async def consume() -> None:
+                nonlocal last_progress_time
+                done = 0
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    player_name, fetched = item
+                    done += 1
+                
+                    player_info = stage_player(uploader, player_name, fetched) if fetched else None
+                    if player_info:
+                        unflushed.append(player_info)
+                    else:
+                        counts['fail'] += 1
+                
+                    # Show progress periodically (at least every 5 minutes)
+                    now = time.monotonic()
+                    if done % progress_interval == 0 or now - last_progress_time > 300:
+                        elapsed = now - start_time
+                        logger.info("Progress: %s/%s players (%.1f%%). Elapsed: %.1f minutes, Est. remaining: %.1f minutes",
+                                    done, total_players, done/total_players*100,
+                                    elapsed/60, elapsed/done*(total_players - done)/60)
+                        last_progress_time = now
+                
+                    # Upsert and checkpoint periodically
+                    if len(unflushed) >= FLUSH_EVERY_PLAYERS:
+                        await flush()
+            
+                await flush()
+        
+            try:
+                await asyncio.gather(produce(), consume())
+            finally:
+                row_hashes.close()
+            if uploader.skipped_unchanged:
+                logger.info("Skipped %s rows unchanged since their last upsert", uploader.skipped_unchanged)
+
+
 def main():
     """Main function to process all players"""
     # Check that Supabase credentials are available
@@ -738,206 +1415,75 @@ def main():
         logger.error("No player names loaded. Please check your players.txt file.")
         return
     
-    # Initialize classes
-    fetcher = NBADataFetcher(rate_limit_wait=1.5, max_retries=3)
-    uploader = SupabaseUploader(supabase)
-    
     # Record start time for overall process
     start_time = time.time()
     
     # Print rate limit warning
     logger.info("=== NBA API CONNECTION INFO ===")
-    logger.info("Using strict 1.5 second delay between API requests to avoid rate limiting")
-    logger.info(f"Estimated processing time for {len(player_names)} players: " + 
-                f"approximately {len(player_names) * 4 * 1.5 / 60:.1f} minutes minimum " +
-                f"(4 API calls per player with 1.5s delay)")
+    logger.info("Using a token bucket of one API request per 1.5 seconds (bursts of 4), %s-%s players in flight, 4 calls each in parallel", MIN_CONCURRENT_PLAYERS, MAX_CONCURRENT_PLAYERS)
+    logger.info("Estimated processing time for %s players: "
+                "approximately %.1f minutes minimum "
+                "(4 API calls per player at 1.5s per call)",
+                len(player_names), len(player_names) * 4 * 1.5 / 60)
     logger.info("Added improved error handling for 500 errors")
     logger.info("Using cache for player lookup to minimize API calls")
     logger.info("=============================")
     
-    # Preload all players at the start to reduce API calls
-    logger.info("Preloading all current NBA players...")
-    all_players = fetcher.fetch_all_players()
-    if not all_players:
-        logger.error("Failed to preload player list from NBA API. Continuing with individual lookups...")
-    else:
-        logger.info(f"Successfully preloaded {len(all_players)} players from NBA API")
-    
-    # Track progress
-    progress_interval = max(1, len(player_names) // 20)  # Show progress every ~5%
-    last_progress_time = time.time()
-    
-    # Create a resumption point file to allow continuing after interruptions
-    resumption_file = "nba_progress.json"
-    processed_players = []
-    start_index = 0
-    
-    # Check if we have a resumption point
-    if os.path.exists(resumption_file):
-        try:
-            with open(resumption_file, 'r') as f:
-                resume_data = json.load(f)
-                processed_players = resume_data.get('processed', [])
-                last_player = resume_data.get('last_player', '')
-                
-                if last_player and last_player in player_names:
-                    start_index = player_names.index(last_player) + 1
-                    logger.info(f"Resuming from player {start_index}/{len(player_names)}: {last_player}")
-                else:
-                    logger.info(f"Found {len(processed_players)} previously processed players")
-        except Exception as e:
-            logger.error(f"Error reading resumption file: {e}")
-            # Continue from the beginning if there's an error
+    # Every player whose rows were upserted is appended to the checkpoint file, so
+    # an interrupted run resumes without re-fetching them. Players finish out of
+    # order, so resume from the checkpointed names rather than a list index.
+    checkpoint_file = CHECKPOINT_FILE
+    already_processed = {record.get("name") for record in load_checkpoint(checkpoint_file)}
+    if already_processed:
+        logger.info("Found %s previously processed players", len(already_processed))
     
-    # Process each player
     total_players = len(player_names)
-    success_count = 0
-    fail_count = 0
+    counts = {'success': 0, 'fail': 0, 'last_player': ''}
+    
+    # Skip players that were already processed in a previous run
+    pending = [name for name in player_names if name not in already_processed]
+    counts['success'] = total_players - len(pending)
+    if counts['success']:
+        logger.info("Skipping %s players already processed in a previous run", counts['success'])
     
-    logger.info(f"Starting to process {total_players} players from index {start_index}...")
+    logger.info("Starting to process %s of %s players...", len(pending), total_players)
     
     try:
-        for i in range(start_index, len(player_names)):
-            player_name = player_names[i]
-            
-            # Show progress periodically
-            if (i - start_index + 1) % progress_interval == 0 or time.time() - last_progress_time > 300:
-                elapsed = time.time() - start_time
-                players_done = i - start_index + 1
-                if players_done > 0:
-                    avg_time_per_player = elapsed / players_done
-                    est_remaining = avg_time_per_player * (total_players - i - 1)
-                    logger.info(f"Progress: {i+1}/{total_players} players ({(i+1)/total_players*100:.1f}%)")
-                    logger.info(f"Elapsed: {elapsed/60:.1f} minutes, Est. remaining: {est_remaining/60:.1f} minutes")
-                    last_progress_time = time.time()
-            
-            logger.info(f"Processing player {i+1}/{total_players}: {player_name}...")
-            
-            # Check if this player was already processed
-            already_processed = False
-            for proc in processed_players:
-                if proc.get("name") == player_name:
-                    logger.info(f"Player {player_name} was already processed in a previous run, skipping...")
-                    already_processed = True
-                    success_count += 1
-                    break
-                    
-            if already_processed:
-                continue
-            
-            # First, search for the player to get their ID
-            player_id = fetcher.search_player_by_name(player_name)
-            
-            if not player_id:
-                logger.error(f"Could not find player ID for: {player_name}")
-                fail_count += 1
-                continue
-            
-            # Fetch player basic info
-            basic_info = fetcher.fetch_player_info(player_id)
-            
-            if not basic_info:
-                logger.error(f"Could not fetch basic info for player: {player_name} (ID: {player_id})")
-                fail_count += 1
-                continue
-            
-            # Store basic info
-            if not uploader.store_player_basic_info(basic_info):
-                logger.error(f"Failed to store basic info for player: {player_name}")
-                fail_count += 1
-                continue
-                
-            success = True
-            
-            # Fetch and store current season stats - don't worry if they fail
-            current_stats = fetcher.fetch_player_stats(player_id)
-            if current_stats:
-                success = uploader.store_player_current_stats(player_id, current_stats) and success
-            else:
-                logger.warning(f"No current season stats available for player: {player_name}")
-                # Not counting this as a failure - many players don't have current stats
-            
-            # Fetch and store career stats
-            career_stats = fetcher.fetch_player_career_stats(player_id)
-            if career_stats:
-                success = uploader.store_player_career_stats(player_id, career_stats) and success
-            else:
-                logger.warning(f"No career stats available for player: {player_name}")
-                # Not counting as a failure, but it's unusual
-            
-            # Fetch and store season highs - don't worry if they fail
-            season_highs = fetcher.fetch_player_season_highs(player_id)
-            if season_highs:
-                success = uploader.store_player_season_highs(player_id, season_highs) and success
-            else:
-                logger.warning(f"No season highs available for player: {player_name}")
-                # Not counting this as a failure - many players don't have season highs
-            
-            # Consider the player processed even if some stats are missing
-            # The most important thing is that we have the basic player info
-            player_info = {
-                "name": player_name,
-                "id": player_id,
-                "full_name": basic_info.get("DISPLAY_FIRST_LAST", player_name),
-                "processed_at": datetime.now().isoformat()
-            }
-            
-            processed_players.append(player_info)
-            success_count += 1
-            logger.info(f"Successfully processed player: {player_name}")
-                
-            # Update the resumption file periodically
-            if (i + 1) % 5 == 0:  # Every 5 players
-                with open(resumption_file, 'w') as f:
-                    json.dump({
-                        'last_player': player_name,
-                        'processed': processed_players
-                    }, f)
+        asyncio.run(process_players(pending, counts, checkpoint_file))
     
     except KeyboardInterrupt:
         logger.warning("Process interrupted by user")
-        # Save progress before exiting
-        with open(resumption_file, 'w') as f:
-            json.dump({
-                'last_player': player_name if 'player_name' in locals() else '',
-                'processed': processed_players
-            }, f)
-        logger.info(f"Progress saved. Resume from player: {player_name if 'player_name' in locals() else ''}")
+        # Progress is already in the checkpoint file
+        logger.info("Progress saved in %s. Last completed player: %s", checkpoint_file, counts['last_player'])
     
     except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
-        # Save progress before exiting
-        with open(resumption_file, 'w') as f:
-            json.dump({
-                'last_player': player_name if 'player_name' in locals() else '',
-                'processed': processed_players
-            }, f)
-        logger.info(f"Progress saved. Resume from player: {player_name if 'player_name' in locals() else ''}")
-        raise  # Re-raise the exception after saving progress
+        logger.error("Unexpected error: %s", e, exc_info=True)
+        logger.info("Progress saved in %s. Last completed player: %s", checkpoint_file, counts['last_player'])
+        raise
+    
+    success_count = counts['success']
+    fail_count = counts['fail']
     
     # Processing completed
     elapsed_time = time.time() - start_time
     
     # Print summary
     logger.info("=" * 50)
-    logger.info(f"Processing complete. Runtime: {elapsed_time/60:.1f} minutes")
-    logger.info(f"Successfully processed {success_count} of {total_players} players.")
-    logger.info(f"Failed to process {fail_count} players.")
+    logger.info("Processing complete. Runtime: %.1f minutes", elapsed_time/60)
+    logger.info("Successfully processed %s of %s players.", success_count, total_players)
+    logger.info("Failed to process %s players.", fail_count)
     
-    # Save the final list of processed players
-    with open("processed_players.json", "w") as f:
-        json.dump(processed_players, f, indent=2)
-    
-    logger.info(f"Saved list of processed players to processed_players.json")
-    
-    # Clean up resumption file if everything completed successfully
-    if success_count + fail_count >= total_players - start_index and os.path.exists(resumption_file):
+    # The checkpoint already lists every processed player; once the run is
+    # complete it becomes the final list (a partial run keeps it for resuming)
+    if success_count + fail_count >= total_players and os.path.exists(checkpoint_file):
         try:
-            os.remove(resumption_file)
-            logger.info(f"Removed resumption file: {resumption_file}")
+            os.replace(checkpoint_file, PROCESSED_PLAYERS_FILE)
+            logger.info("Saved list of processed players to %s", PROCESSED_PLAYERS_FILE)
         except Exception as e:
-            logger.warning(f"Could not remove resumption file: {e}")
+            logger.warning("Could not move checkpoint file to %s: %s", PROCESSED_PLAYERS_FILE, e)
+    else:
+        logger.info("Processed players so far are listed in %s", checkpoint_file)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
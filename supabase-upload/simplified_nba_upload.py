@@ -6,12 +6,19 @@ and stores it in Supabase (nba_players and player_career_stats tables).
 
 import os
 import time
-import json
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 
+import orjson
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -59,21 +66,187 @@ PLAYER_INFO_ENDPOINT = "/commonplayerinfo"
 PLAYER_CAREER_ENDPOINT = "/playercareerstats"
 PLAYER_ALL_ENDPOINT = "/commonallplayers"
 
+# Players fetched at once; every worker draws from the same token bucket
+MAX_WORKERS = 4
+MAX_RETRY_WAIT = 30  # Cap (seconds) on any single retry wait
+
+# Supabase batching
+FLUSH_EVERY_PLAYERS = 100  # Completed players between batched Supabase upserts
+UPSERT_BATCH_SIZE = 500  # Max rows per upsert request
+UPSERT_TABLES = ("nba_players", "player_career_stats")
+
+# Persistent HTTP cache for the (idempotent) NBA API GETs, keyed by URL + params
+HTTP_CACHE_NAME = "nba_requests_cache"  # requests-cache adds the .sqlite suffix
+HTTP_CACHE_EXPIRE_AFTER = {
+    PLAYER_ALL_ENDPOINT: timedelta(days=30),  # player search list
+    PLAYER_INFO_ENDPOINT: timedelta(days=7),
+    PLAYER_CAREER_ENDPOINT: timedelta(days=1),
+}
+
+# Supabase column -> NBA API field, one map per table (nested JSON columns get their own)
+PLAYER_BASIC_INFO_MAP = {
+    "first_name": "FIRST_NAME",
+    "last_name": "LAST_NAME",
+    "full_name": "DISPLAY_FIRST_LAST",
+    "jersey_number": "JERSEY",
+    "position": "POSITION",
+    "height": "HEIGHT",
+    "weight": "WEIGHT",
+    "birth_date": "BIRTHDATE",
+    "country": "COUNTRY",
+    "school": "SCHOOL",
+    "draft_year": "DRAFT_YEAR",
+    "draft_round": "DRAFT_ROUND",
+    "draft_number": "DRAFT_NUMBER",
+    "team_id": "TEAM_ID",
+    "team_name": "TEAM_NAME",
+    "from_year": "FROM_YEAR",
+    "to_year": "TO_YEAR",
+}
+CAREER_STATS_MAP = {
+    "games_played": "GP",
+    "ppg": "PTS",
+    "rpg": "REB",
+    "apg": "AST",
+    "spg": "STL",
+    "bpg": "BLK",
+    "fg_pct": "FG_PCT",
+    "ft_pct": "FT_PCT",
+    "fg3_pct": "FG3_PCT",
+}
+CAREER_STATS_ADDL_MAP = {
+    "fg_m": "FGM",
+    "fg_a": "FGA",
+    "fg3_m": "FG3M",
+    "fg3_a": "FG3A",
+    "ft_m": "FTM",
+    "ft_a": "FTA",
+    "oreb": "OREB",
+    "dreb": "DREB",
+    "tov": "TOV",
+    "pf": "PF",
+}
+
+# NBA API columns kept from each resultSet: what the maps above (and the name search) read
+ALL_PLAYERS_COLUMNS = ("PERSON_ID", "DISPLAY_FIRST_LAST", "DISPLAY_LAST_COMMA_FIRST")
+PLAYER_INFO_COLUMNS = tuple(dict.fromkeys(("PERSON_ID", "DISPLAY_FIRST_LAST", *PLAYER_BASIC_INFO_MAP.values())))
+CAREER_STATS_COLUMNS = tuple(dict.fromkeys((*CAREER_STATS_MAP.values(), *CAREER_STATS_ADDL_MAP.values())))
+
+
+def normalize_name(name: str) -> str:
+    """Name search key: accents stripped (NFKD), case folded, whitespace collapsed"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+def column_indices(headers: List[str], columns: Tuple[str, ...]) -> List[Tuple[str, int]]:
+    """(column, position) for each wanted column present in a resultSet's headers"""
+    positions = {header: i for i, header in enumerate(headers)}
+    return [(column, positions[column]) for column in columns if column in positions]
+
+
+def map_fields(column_map: Dict[str, str], data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """(Supabase column, value) pairs for `column_map`, None for NBA fields missing from `data`"""
+    return zip(column_map, map(data.get, column_map.values()))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value
+    
+    Args:
+        value: Header value, either delay seconds or an HTTP date
+        
+    Returns:
+        Seconds to wait, or None if the value is missing or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Request budget for the NBA API; thread-safe"""
+    
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize the token bucket
+        
+        Args:
+            rate: Tokens added per second (the steady request rate)
+            burst: Maximum number of tokens banked while idle
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def acquire(self) -> None:
+        """Block until a token is available and take it"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+    
+    def penalize(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (e.g. after a 429); concurrent penalties overlap, not add up"""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
 
 class NBADataFetcher:
     """Class to handle fetching data from the NBA API"""
     
-    def __init__(self, rate_limit_wait: float = 1.0, max_retries: int = 3):
+    def __init__(self, rate_limit_wait: float = 1.0, max_retries: int = 3, burst: int = 4):
         """
         Initialize the NBA data fetcher
         
         Args:
-            rate_limit_wait: Time to wait between API calls in seconds
+            rate_limit_wait: Average time between API calls in seconds
             max_retries: Maximum number of retry attempts for failed requests
+            burst: Number of calls that may go out back-to-back after an idle spell
         """
         self.rate_limit_wait = rate_limit_wait
         self.max_retries = max_retries
+        self.limiter = TokenBucket(rate=1 / rate_limit_wait, burst=burst)
         self.all_players_cache = None  # Cache for all players
+        self.name_to_id = {}  # normalized "First Last" and "Last, First" -> PERSON_ID, first player wins
+        self.name_index = []  # (PERSON_ID, normalized first last, display name) per cached player, for partial matches
+        self.token_index: Dict[str, Set[int]] = defaultdict(set)  # normalized word -> positions in name_index
+        
+        # One pooled, SQLite-cached session: every call reuses the keep-alive
+        # connection to stats.nba.com, and responses still fresh from an earlier
+        # run (see HTTP_CACHE_EXPIRE_AFTER) are not requested again. Retries stay
+        # in _make_api_request, not in urllib3.
+        nba_host_path = NBA_API_BASE_URL.split("://", 1)[-1]
+        self.session = requests_cache.CachedSession(
+            HTTP_CACHE_NAME,
+            backend="sqlite",
+            expire_after=min(HTTP_CACHE_EXPIRE_AFTER.values()),
+            urls_expire_after={f"{nba_host_path}{endpoint}": expire_after
+                               for endpoint, expire_after in HTTP_CACHE_EXPIRE_AFTER.items()},
+            allowable_methods=("GET",)
+        )
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+        self.session.headers.update(NBA_API_HEADERS)
     
     def _make_api_request(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -90,45 +263,56 @@ class NBADataFetcher:
         retries = 0
         backoff = self.rate_limit_wait
         
+        # A fresh cached response costs no request (and no token)
+        cached = self.session.get(url, params=params, only_if_cached=True)
+        if cached.status_code != 504:
+            return orjson.loads(cached.content)
+        
         while retries <= self.max_retries:
+            # Every call, retries included, spends a token
+            self.limiter.acquire()
             try:
-                logger.debug(f"Making API request to {url} with params {params}")
-                response = requests.get(
+                logger.debug("Making API request to %s with params %s", url, params)
+                response = self.session.get(
                     url, 
-                    headers=NBA_API_HEADERS, 
                     params=params, 
                     timeout=20
                 )
                 
                 response.raise_for_status()
+                logger.debug("%s responded with Content-Encoding %s", endpoint, response.headers.get("Content-Encoding"))
                 
-                # Wait to avoid rate limiting
-                time.sleep(self.rate_limit_wait)
-                
-                return response.json()
+                return orjson.loads(response.content)
                 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"API request error (attempt {retries+1}/{self.max_retries+1}): {e}")
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+                logger.error("API request error (attempt %s/%s): %s", retries+1, self.max_retries+1, e)
                 retries += 1
                 
                 # If we're rate limited, wait longer
-                if hasattr(e, 'response') and e.response and e.response.status_code == 429:
-                    backoff = max(10, backoff * 2)  # At least 10 seconds, doubling each time
-                    logger.warning(f"Rate limited. Waiting {backoff} seconds before retrying...")
+                rate_limited = getattr(e, 'response', None) is not None and e.response.status_code == 429
+                if rate_limited:
+                    # At least 10 seconds, doubling each time, or longer if the server says so
+                    retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                    backoff = min(MAX_RETRY_WAIT, max(10, backoff * 2, retry_after or 0))
+                    logger.warning("Rate limited. Waiting %s seconds before retrying...", backoff)
+                    # Nobody else should hit the API while we back off either
+                    self.limiter.penalize(backoff)
                 else:
                     # Standard exponential backoff for other errors
-                    backoff *= 2
+                    backoff = min(MAX_RETRY_WAIT, backoff * 2)
                 
-                if retries <= self.max_retries:
-                    logger.info(f"Retrying in {backoff} seconds...")
-                    time.sleep(backoff)
-                else:
-                    logger.error(f"Failed after {self.max_retries+1} attempts.")
+                if retries > self.max_retries:
+                    logger.error("Failed after %s attempts.", self.max_retries+1)
                     return None
+                if not rate_limited:
+                    # After a 429 the penalized bucket already holds the retry back
+                    logger.info("Retrying in %s seconds...", backoff)
+                    time.sleep(backoff)
     
     def fetch_all_players(self, force_refresh: bool = False) -> Optional[List[Dict[str, Any]]]:
         """
-        Fetch list of all NBA players
+        Fetch list of all NBA players and build the name index that
+        search_player_by_name reads; call once before searching
         
         Args:
             force_refresh: Whether to force a refresh of the cached player list
@@ -165,76 +349,78 @@ class NBADataFetcher:
             headers = result_sets[0]["headers"]
             rows = result_sets[0]["rowSet"]
             
-            # Create list of player dictionaries
-            players = []
-            for row in rows:
-                player = dict(zip(headers, row))
-                players.append(player)
+            # Create list of player dictionaries with just the columns the search needs
+            indices = column_indices(headers, ALL_PLAYERS_COLUMNS)
+            players = [{column: row[i] for column, i in indices} for row in rows]
             
-            # Cache the results
+            # Cache the results, with names normalized once for every later search
             self.all_players_cache = players
-            
-            logger.info(f"Successfully fetched {len(players)} players")
+            self.name_to_id = {}
+            self.name_index = []
+            self.token_index = defaultdict(set)
+            for player in players:
+                player_id = player.get("PERSON_ID")
+                display_name = normalize_name(player.get("DISPLAY_FIRST_LAST") or "")
+                self.name_to_id.setdefault(display_name, player_id)
+                self.name_to_id.setdefault(normalize_name(player.get("DISPLAY_LAST_COMMA_FIRST") or ""), player_id)
+                for token in display_name.split():
+                    self.token_index[token].add(len(self.name_index))
+                self.name_index.append((player_id, display_name, player.get("DISPLAY_FIRST_LAST")))
+            
+            logger.info("Successfully fetched %s players", len(players))
             return players
             
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing all players response: {e}")
+            logger.error("Error parsing all players response: %s", e)
             return None
 
     def search_player_by_name(self, player_name: str) -> Optional[int]:
         """
         Search for a player by name to get their player ID
         
+        fetch_all_players must have been called first; this only reads its index.
+        
         Args:
             player_name: The player's full name
             
         Returns:
             The player ID or None if not found
         """
-        logger.info(f"Searching for player: {player_name}")
-        
-        # Get all players if we haven't already
-        all_players = self.fetch_all_players()
-        if not all_players:
-            logger.error("Could not fetch player list")
-            return None
+        logger.info("Searching for player: %s", player_name)
         
         # Normalize the player name for comparison
-        normalized_name = player_name.lower().strip()
+        normalized_name = normalize_name(player_name)
+        name_parts = normalized_name.split()
         
-        # First try exact match
-        for player in all_players:
-            # Check both display name formats
-            display_name = player.get("DISPLAY_FIRST_LAST", "").lower()
-            display_last_first = player.get("DISPLAY_LAST_COMMA_FIRST", "").lower()
-            
-            if normalized_name == display_name or normalized_name == display_last_first:
-                player_id = player.get("PERSON_ID")
-                logger.info(f"Found exact match for {player_name}: ID {player_id}")
+        # First try exact match against both display name formats
+        player_id = self.name_to_id.get(normalized_name)
+        if player_id is not None:
+            logger.info("Found exact match for %s: ID %s", player_name, player_id)
+            return player_id
+        
+        # Then the first player whose name has every part of the search name as a word
+        postings = [self.token_index.get(part) for part in name_parts]
+        if postings and all(postings):
+            matches = set.intersection(*postings)
+            if matches:
+                player_id, _, found_name = self.name_index[min(matches)]
+                logger.info("Found partial match for %s: %s (ID %s)", player_name, found_name, player_id)
                 return player_id
         
-        # Then try partial matches
-        partial_matches = []
-        for player in all_players:
-            display_name = player.get("DISPLAY_FIRST_LAST", "").lower()
-            
-            # Check if the search name is contained in the player name
-            # or if each part of the search name appears in the player name
-            name_parts = normalized_name.split()
-            if (normalized_name in display_name or 
-                all(part in display_name for part in name_parts)):
-                partial_matches.append((
-                    player.get("PERSON_ID"),
-                    player.get("DISPLAY_FIRST_LAST")
-                ))
-        
-        if partial_matches:
-            # Just take the first match for simplicity
-            player_id, found_name = partial_matches[0]
-            logger.info(f"Found partial match for {player_name}: {found_name} (ID {player_id})")
+        # Failing that, take the first partial match: the search name is contained
+        # in the player name, or each part of the search name appears in it
+        partial_match = next(
+            ((pid, found_name) for pid, display_name, found_name in self.name_index
+             if normalized_name in display_name
+             or all(part in display_name for part in name_parts)),
+            None
+        )
+        if partial_match:
+            player_id, found_name = partial_match
+            logger.info("Found partial match for %s: %s (ID %s)", player_name, found_name, player_id)
             return player_id
         
-        logger.warning(f"No player found for: {player_name}")
+        logger.warning("No player found for: %s", player_name)
         return None
     
     def fetch_player_info(self, player_id: int) -> Optional[Dict[str, Any]]:
@@ -247,7 +433,7 @@ class NBADataFetcher:
         Returns:a
             Dictionary with player information or None if the request failed
         """
-        logger.info(f"Fetching basic info for player {player_id}")
+        logger.info("Fetching basic info for player %s", player_id)
         
         params = {
             "PlayerID": player_id,
@@ -263,19 +449,18 @@ class NBADataFetcher:
             # Extract player info from the response
             result_sets = response.get("resultSets", [])
             if not result_sets or not result_sets[0].get("rowSet"):
-                logger.warning(f"No data found for player {player_id}")
+                logger.warning("No data found for player %s", player_id)
                 return None
             
             # Get column headers and row data
             headers = result_sets[0]["headers"]
             row_data = result_sets[0]["rowSet"][0]
             
-            # Create dictionary mapping headers to values
-            player_info = dict(zip(headers, row_data))
-            return player_info
+            # Keep only the columns that get stored
+            return {column: row_data[i] for column, i in column_indices(headers, PLAYER_INFO_COLUMNS)}
             
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing player info for {player_id}: {e}")
+            logger.error("Error parsing player info for %s: %s", player_id, e)
             return None
     
     def fetch_player_career_stats(self, player_id: int) -> Optional[Dict[str, Any]]:
@@ -288,7 +473,7 @@ class NBADataFetcher:
         Returns:
             Dictionary with career stats or None if the request failed
         """
-        logger.info(f"Fetching career stats for player {player_id}")
+        logger.info("Fetching career stats for player %s", player_id)
         
         params = {
             "PlayerID": player_id,
@@ -312,19 +497,18 @@ class NBADataFetcher:
                     break
             
             if not career_totals_set or not career_totals_set.get("rowSet"):
-                logger.warning(f"No career stats found for player {player_id}")
+                logger.warning("No career stats found for player %s", player_id)
                 return None
             
             # Get column headers and row data
             headers = career_totals_set["headers"]
             row_data = career_totals_set["rowSet"][0]
             
-            # Create dictionary mapping headers to values
-            career_stats = dict(zip(headers, row_data))
-            return career_stats
+            # Keep only the columns that get stored
+            return {column: row_data[i] for column, i in column_indices(headers, CAREER_STATS_COLUMNS)}
             
         except (KeyError, IndexError) as e:
-            logger.error(f"Error parsing career stats for {player_id}: {e}")
+            logger.error("Error parsing career stats for %s: %s", player_id, e)
             return None
             
     def get_player_headshot_url(self, player_id: int) -> str:
@@ -337,16 +521,20 @@ class NBADataFetcher:
         Returns:
             URL string for the player's headshot
         """
-        logger.info(f"Generating headshot URL for player {player_id}")
+        logger.info("Generating headshot URL for player %s", player_id)
         
         # NBA.com headshot URL format - 1040x760 is the high resolution version
         headshot_url = f"https://cdn.nba.com/headshots/nba/latest/1040x760/{player_id}.png"
         
         return headshot_url
+    
+    def close(self) -> None:
+        """Close the pooled connections and the HTTP cache"""
+        self.session.close()
 
 
 class SupabaseUploader:
-    """Class to handle uploading data to Supabase"""
+    """Class to handle uploading data to Supabase in batches"""
     
     def __init__(self, client: Client):
         """
@@ -356,120 +544,104 @@ class SupabaseUploader:
             client: Initialized Supabase client
         """
         self.client = client
+        # table -> {player_id: row}; a later row for the same player replaces the earlier one
+        self._pending: Dict[str, Dict[Any, Dict[str, Any]]] = {table: {} for table in UPSERT_TABLES}
+    
+    def flush(self, batch_size: int = UPSERT_BATCH_SIZE) -> bool:
+        """
+        Upsert every staged row, one request per table per `batch_size` rows
+        
+        Args:
+            batch_size: Maximum number of rows per upsert request
+            
+        Returns:
+            True if every batch was stored, False otherwise
+        """
+        pending, self._pending = self._pending, {table: {} for table in UPSERT_TABLES}
+        
+        # Every row in this flush shares one ingest time
+        now = datetime.now(timezone.utc).isoformat()
+        ok = True
+        for table, rows_by_player in pending.items():
+            rows = list(rows_by_player.values())
+            for row in rows:
+                row["updated_at"] = now
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                try:
+                    result = self.client.table(table).upsert(
+                        batch,
+                        on_conflict="player_id"
+                    ).execute()
+                    
+                    if hasattr(result, 'error') and result.error:
+                        logger.error("Error upserting %s rows into %s: %s", len(batch), table, result.error)
+                        ok = False
+                        continue
+                    
+                    logger.info("Upserted %s rows into %s", len(batch), table)
+                    
+                except Exception as e:
+                    logger.error("Exception upserting %s rows into %s: %s", len(batch), table, e)
+                    ok = False
+        return ok
     
     def store_player_basic_info(self, player_data: Dict[str, Any], headshot_url: str) -> bool:
         """
-        Store basic player information in Supabase
+        Stage basic player information for the next batched upsert to Supabase
         
         Args:
             player_data: Player data dictionary from API
             headshot_url: URL to the player's headshot image
             
         Returns:
-            True if successful, False otherwise
+            True if the row was staged, False otherwise
         """
         player_id = player_data.get("PERSON_ID")
         player_name = player_data.get("DISPLAY_FIRST_LAST", f"ID: {player_id}")
-        logger.info(f"Storing basic info for {player_name}")
+        logger.info("Formatting basic info for %s", player_name)
         
         try:
             # Format data for the nba_players table
-            formatted_data = {
-                "player_id": player_id,
-                "first_name": player_data.get("FIRST_NAME"),
-                "last_name": player_data.get("LAST_NAME"),
-                "full_name": player_data.get("DISPLAY_FIRST_LAST"),
-                "jersey_number": player_data.get("JERSEY"),
-                "position": player_data.get("POSITION"),
-                "height": player_data.get("HEIGHT"),
-                "weight": player_data.get("WEIGHT"),
-                "birth_date": player_data.get("BIRTHDATE"),
-                "country": player_data.get("COUNTRY"),
-                "school": player_data.get("SCHOOL"),
-                "draft_year": player_data.get("DRAFT_YEAR"),
-                "draft_round": player_data.get("DRAFT_ROUND"),
-                "draft_number": player_data.get("DRAFT_NUMBER"),
-                "team_id": player_data.get("TEAM_ID"),
-                "team_name": player_data.get("TEAM_NAME"),
-                "from_year": player_data.get("FROM_YEAR"),
-                "to_year": player_data.get("TO_YEAR"),
-                "headshot_url": headshot_url,
-                "updated_at": datetime.now().isoformat()
-            }
-            
-            # Insert or update player data
-            result = self.client.table("nba_players").upsert(
-                formatted_data,
-                on_conflict="player_id"
-            ).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error storing basic info for {player_name}: {result.error}")
-                return False
+            formatted_data = {"player_id": player_id}
+            formatted_data.update(map_fields(PLAYER_BASIC_INFO_MAP, player_data))
+            formatted_data["headshot_url"] = headshot_url
             
-            logger.info(f"Successfully stored basic info for {player_name}")
+            # Queue for the next batched upsert
+            self._pending["nba_players"][player_id] = formatted_data
+            logger.info("Staged basic info for %s", player_name)
             return True
             
         except Exception as e:
-            logger.error(f"Exception storing basic info for {player_name}: {e}")
+            logger.error("Exception formatting basic info for %s: %s", player_name, e)
             return False
     
     def store_player_career_stats(self, player_id: int, career_data: Dict[str, Any]) -> bool:
         """
-        Store career stats in Supabase
+        Stage career stats for the next batched upsert to Supabase
         
         Args:
             player_id: Player ID
             career_data: Career stats data dictionary
             
         Returns:
-            True if successful, False otherwise
+            True if the row was staged, False otherwise
         """
-        logger.info(f"Storing career stats for player {player_id}")
+        logger.info("Formatting career stats for player %s", player_id)
         
         try:
             # Format data for the player_career_stats table
-            formatted_data = {
-                "player_id": player_id,
-                "games_played": career_data.get("GP"),
-                "ppg": career_data.get("PTS"),
-                "rpg": career_data.get("REB"),
-                "apg": career_data.get("AST"),
-                "spg": career_data.get("STL"),
-                "bpg": career_data.get("BLK"),
-                "fg_pct": career_data.get("FG_PCT"),
-                "ft_pct": career_data.get("FT_PCT"),
-                "fg3_pct": career_data.get("FG3_PCT"),
-                "additional_stats": {
-                    "fg_m": career_data.get("FGM"),
-                    "fg_a": career_data.get("FGA"),
-                    "fg3_m": career_data.get("FG3M"),
-                    "fg3_a": career_data.get("FG3A"),
-                    "ft_m": career_data.get("FTM"),
-                    "ft_a": career_data.get("FTA"),
-                    "oreb": career_data.get("OREB"),
-                    "dreb": career_data.get("DREB"),
-                    "tov": career_data.get("TOV"),
-                    "pf": career_data.get("PF")
-                },
-                "updated_at": datetime.now().isoformat()
-            }
-            
-            # Insert or update the career stats data
-            result = self.client.table("player_career_stats").upsert(
-                formatted_data,
-                on_conflict="player_id"
-            ).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                logger.error(f"Error storing career stats for player {player_id}: {result.error}")
-                return False
+            formatted_data = {"player_id": player_id}
+            formatted_data.update(map_fields(CAREER_STATS_MAP, career_data))
+            formatted_data["additional_stats"] = dict(map_fields(CAREER_STATS_ADDL_MAP, career_data))
             
-            logger.info(f"Successfully stored career stats for player {player_id}")
+            # Queue for the next batched upsert
+            self._pending["player_career_stats"][player_id] = formatted_data
+            logger.info("Staged career stats for player %s", player_id)
             return True
             
         except Exception as e:
-            logger.error(f"Exception storing career stats for player {player_id}: {e}")
+            logger.error("Exception formatting career stats for player %s: %s", player_id, e)
             return False
 
 
@@ -481,18 +653,27 @@ def load_player_names(file_path: str = "players.txt") -> List[str]:
         file_path: Path to the text file containing player names
         
     Returns:
-        List of player names
+        List of unique player names, in the order they first appear
     """
     try:
         with open(file_path, 'r') as f:
-            # Read lines and strip whitespace
-            player_names = [line.strip() for line in f if line.strip()]
-        
-        logger.info(f"Loaded {len(player_names)} player names from {file_path}")
+            # Stream lines, strip whitespace and drop repeats (dicts keep insertion order)
+            unique_names: Dict[str, None] = {}
+            total = 0
+            for line in f:
+                name = line.strip()
+                if name:
+                    total += 1
+                    unique_names.setdefault(name, None)
+        player_names = list(unique_names)
+        
+        logger.info("Loaded %s player names from %s", len(player_names), file_path)
+        if total > len(player_names):
+            logger.info("Skipped %s duplicate player names", total - len(player_names))
         return player_names
             
     except Exception as e:
-        logger.error(f"Error loading player names: {e}")
+        logger.error("Error loading player names: %s", e)
         return []
 
 
@@ -518,59 +699,95 @@ def main():
     total_players = len(player_names)
     success_count = 0
     fail_count = 0
+    unflushed = 0  # Players whose rows are staged but not yet upserted
+    
+    def flush() -> None:
+        """Upsert staged rows; only then do their players count as processed"""
+        nonlocal success_count, fail_count, unflushed
+        if not unflushed:
+            return
+        if uploader.flush():
+            success_count += unflushed
+        else:
+            logger.error("Batched upsert failed for %s players", unflushed)
+            fail_count += unflushed
+        unflushed = 0
     
-    logger.info(f"Starting to process {total_players} players...")
+    logger.info("Starting to process %s players...", total_players)
     
-    # First, preload all players to optimize searching
+    # Every name search reads this one list, so it has to load first
     all_players = fetcher.fetch_all_players()
     if not all_players:
-        logger.warning("Could not preload player list, will attempt individual lookups")
+        logger.error("Could not fetch player list; no players can be looked up")
+        fetcher.close()
+        return
     
-    for i, player_name in enumerate(player_names):
-        logger.info(f"Processing player {i+1}/{total_players}: {player_name}...")
-        
-        # First, search for the player to get their ID
+    # Resolve every name before any stat calls, so unknown names never reach a worker
+    resolved: List[Tuple[str, int]] = []
+    for player_name in player_names:
         player_id = fetcher.search_player_by_name(player_name)
-        
-        if not player_id:
-            logger.error(f"Could not find player ID for: {player_name}")
+        if player_id:
+            resolved.append((player_name, player_id))
+        else:
+            logger.error("Could not find player ID for: %s", player_name)
             fail_count += 1
-            continue
+    
+    def fetch(player: Tuple[str, int]) -> Optional[Tuple[int, Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Fetch one resolved player's data (runs on a worker thread)"""
+        player_name, player_id = player
+        logger.info("Processing player: %s...", player_name)
         
         # Fetch basic info for the player
         basic_info = fetcher.fetch_player_info(player_id)
         
         if not basic_info:
-            logger.error(f"Could not fetch basic info for player: {player_name} (ID: {player_id})")
-            fail_count += 1
-            continue
-        
-        # Generate headshot URL
-        headshot_url = fetcher.get_player_headshot_url(player_id)
-        
-        # Store basic info with headshot URL
-        if not uploader.store_player_basic_info(basic_info, headshot_url):
-            logger.error(f"Failed to store basic info for player: {player_name}")
-            fail_count += 1
-            continue
-        
-        # Fetch and store career stats
-        career_stats = fetcher.fetch_player_career_stats(player_id)
-        if career_stats:
-            if not uploader.store_player_career_stats(player_id, career_stats):
-                logger.warning(f"Failed to store career stats for player: {player_name}")
-                # Not counting as a full failure since we got the basic info
-        else:
-            logger.warning(f"No career stats available for player: {player_name}")
-            # Not counting as a failure, but it's unusual
+            logger.error("Could not fetch basic info for player: %s (ID: %s)", player_name, player_id)
+            return None
         
-        success_count += 1
-        logger.info(f"Successfully processed player: {player_name}")
+        return player_id, basic_info, fetcher.fetch_player_career_stats(player_id)
+    
+    # Workers only fetch; staging and flushing stay on this thread, in list order
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for i, ((player_name, _), fetched) in enumerate(zip(resolved, executor.map(fetch, resolved))):
+                if not fetched:
+                    fail_count += 1
+                    continue
+                player_id, basic_info, career_stats = fetched
+                
+                # Generate headshot URL
+                headshot_url = fetcher.get_player_headshot_url(player_id)
+                
+                # Store basic info with headshot URL
+                if not uploader.store_player_basic_info(basic_info, headshot_url):
+                    logger.error("Failed to store basic info for player: %s", player_name)
+                    fail_count += 1
+                    continue
+                
+                # Store career stats
+                if career_stats:
+                    if not uploader.store_player_career_stats(player_id, career_stats):
+                        logger.warning("Failed to store career stats for player: %s", player_name)
+                        # Not counting as a full failure since we got the basic info
+                else:
+                    logger.warning("No career stats available for player: %s", player_name)
+                    # Not counting as a failure, but it's unusual
+                
+                unflushed += 1
+                logger.info("Successfully processed player %s/%s: %s", i+1, len(resolved), player_name)
+                
+                # Upsert periodically
+                if unflushed >= FLUSH_EVERY_PLAYERS:
+                    flush()
+    finally:
+        # Keep what was staged before an error or Ctrl-C, then release the session
+        flush()
+        fetcher.close()
     
     # Processing completed
     logger.info("=" * 50)
-    logger.info(f"Processing complete. Successfully processed {success_count} of {total_players} players.")
-    logger.info(f"Failed to process {fail_count} players.")
+    logger.info("Processing complete. Successfully processed %s of %s players.", success_count, total_players)
+    logger.info("Failed to process %s players.", fail_count)
 
 
 if __name__ == "__main__":